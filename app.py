@@ -1,6 +1,20 @@
 import streamlit as st
-import pandas as pd
+import datetime
 import io
+import json
+import os
+
+from hasty.cache import ResultCache, cache_key
+from hasty.consolidate import Portfolio, workbook_ids
+from hasty.engine import TechnologySheetError, run_analysis
+from hasty.export import export_bytes, output_formats
+from hasty.ingest import read_survey
+from hasty.instrument import Profiler, log_to_file
+from hasty.jobs import JobRunner
+from hasty.preview import commodity_summary, page_count, preview_page
+from hasty.trends import key_cols, list_snapshots, load_snapshots, save_snapshot, trend_sheets
+from hasty.units import UnitRegistry, load_units
+from hasty.validate import flagged_rows, report_frame, validate_participants
 
 
 # --- Page Config ---
@@ -29,7 +43,23 @@ if not st.session_state.logged_in:
 if st.session_state.logged_in:
     # Sidebar navigation
     st.sidebar.title("⚙️ Menu")
-    option = st.sidebar.radio("Select Options:", ["About HASTY", "Analysis"])
+    option = st.sidebar.radio("Select Options:", ["About HASTY", "Analysis", "Consolidation", "Trends"])
+
+    # Saved indicator snapshots (one per period and partner) feed the Trends page
+    snapshot_store = os.environ.get("HASTY_SNAPSHOT_DIR", "hasty_snapshots")
+
+    def snapshot_form(all_sheets, default_partner, form_key):
+        with st.expander("💾 Save these results as a snapshot for trends"):
+            left, right = st.columns(2)
+            period = left.text_input("Period", value=str(datetime.date.today().year), key=f"{form_key}_period")
+            partner = right.text_input("Partner", value=default_partner, key=f"{form_key}_partner")
+            if st.button("Save snapshot", key=f"{form_key}_save"):
+                try:
+                    save_snapshot(all_sheets, snapshot_store, period, partner)
+                except (ImportError, ValueError) as e:
+                    st.error(f"Snapshot not saved: {e}")
+                else:
+                    st.success(f"Saved snapshot {period} / {partner}; it now appears on the Trends page.")
 
     # --- Page: About HASTY ---
     if option == "About HASTY":
@@ -61,341 +91,308 @@ if st.session_state.logged_in:
             "The app will produce an Excel workbook with commodity sheets and a Technology sheet."
         )
 
-        @st.cache_data
-        def read_excel(file) -> pd.DataFrame:
-            return pd.read_excel(file)
-
-        # --- Commodity Analysis Function ---
-        def compute_for_commodity(df_comm: pd.DataFrame) -> pd.DataFrame:
-            df = df_comm.copy()
-            numeric_cols = ["male", "female", "totalmf", "Age_15-29_ratio",
-                            "production_area", "total_production",
-                            "quantity_sales", "value_sales", "per_dollar_rate"]
-            for c in numeric_cols:
-                if c in df.columns:
-                    df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-
-            # Helper functions
-            def prod_contrib(row, sex_count_col):
-                tp_unit = str(row.get('tp_unit', '')).strip().lower()
-                commodity_type = str(row.get('commodity_type', '')).strip().lower()
-                count = row.get(sex_count_col, 0)
-                tp = row.get('total_production', 0)
-                if commodity_type == "livestock":
-                    return count * tp
-                else:
-                    if tp_unit == 'kg':
-                        return (count * tp) / 1000.0
-                    else:
-                        return count * tp
-
-            def area_contrib(row, sex_count_col):
-                unit = str(row.get('parea_unit', '')).strip().lower()
-                count = row.get(sex_count_col, 0)
-                pa = row.get('production_area', 0)
-                if unit == 'dec':
-                    return (count * pa) / 247.10514233241506
-                elif unit == 'acre':
-                    return (count * pa) * 0.4046
-                else:
-                    return (count * pa)
-
-            def volume_sales(row, sex_count_col):
-                q_unit = str(row.get('qsales_unit', '')).strip().lower()
-                comm_type = str(row.get('commodity_type', '')).strip().lower()
-                count = row.get(sex_count_col, 0)
-                qty = row.get('quantity_sales', 0)
-                if comm_type == "livestock":
-                    return count * qty
-                else:
-                    if q_unit == "kg":
-                        return (count * qty) / 1000.0
-                    else:
-                        return count * qty
-
-            def value_sales(row, sex_count_col):
-                count = row.get(sex_count_col, 0)
-                val = row.get("value_sales", 0)
-                per_rate = row.get("per_dollar_rate", 1)
-                return round((count * val) / per_rate, 2)
-
-            df['male_prod_contrib'] = df.apply(lambda r: prod_contrib(r, 'male'), axis=1)
-            df['female_prod_contrib'] = df.apply(lambda r: prod_contrib(r, 'female'), axis=1)
-            df['male_area_contrib'] = df.apply(lambda r: area_contrib(r, 'male'), axis=1)
-            df['female_area_contrib'] = df.apply(lambda r: area_contrib(r, 'female'), axis=1)
-            df['male_vol_sales'] = df.apply(lambda r: volume_sales(r, 'male'), axis=1)
-            df['female_vol_sales'] = df.apply(lambda r: volume_sales(r, 'female'), axis=1)
-            df['male_val_sales'] = df.apply(lambda r: value_sales(r, 'male'), axis=1)
-            df['female_val_sales'] = df.apply(lambda r: value_sales(r, 'female'), axis=1)
-
-            # Totals
-            male_prod_sum = df['male_prod_contrib'].sum()
-            female_prod_sum = df['female_prod_contrib'].sum()
-            total_prod_sum = male_prod_sum + female_prod_sum
-
-            male_area_sum = df['male_area_contrib'].sum()
-            female_area_sum = df['female_area_contrib'].sum()
-            total_area_sum = male_area_sum + female_area_sum
-
-            male_participants = df['male'].sum()
-            female_participants = df['female'].sum()
-            total_participants = male_participants + female_participants
-
-            male_vol_sum = df['male_vol_sales'].sum()
-            female_vol_sum = df['female_vol_sales'].sum()
-            total_vol_sum = male_vol_sum + female_vol_sum
-
-            male_val_sum = df['male_val_sales'].sum()
-            female_val_sum = df['female_val_sales'].sum()
-            total_val_sum = male_val_sum + female_val_sum
-
-            # Age ratio
-            if df['totalmf'].sum() > 0:
-                age_ratio = (df['Age_15-29_ratio'] * df['totalmf']).sum() / df['totalmf'].sum()
-            else:
-                age_ratio = df['Age_15-29_ratio'].mean() if len(df) > 0 else 0
-            age_frac = float(age_ratio) / 100.0 if pd.notna(age_ratio) else 0.0
-
-            # Build Results
-            rows = []
-            commodity_name = df_comm['commodity_name'].iloc[0]
-
-            commodity_type = str(df_comm['commodity_type'].iloc[0]).strip().lower()
-            # Overall Yield
-            overall_yield = total_prod_sum / total_area_sum if total_area_sum != 0 else 0
-            rows.append((commodity_name,commodity_type, 'Overall', 'Yield', round(overall_yield, 2), 'Yield'))
-
-            # Production, Area, Participants, Value, Volume
-            sections = ['Total Production', 'Production Area', 'Total Number of Participants', 'Value of Sales', 'Volume of Sales']
-            for sec in sections:
-                if sec == 'Total Production':
-                    values = [total_prod_sum, male_prod_sum, female_prod_sum, total_prod_sum, total_prod_sum*age_frac, total_prod_sum*(1-age_frac)]
-                    unit = 'tonne_or_unit'
-                elif sec == 'Production Area':
-                    values = [total_area_sum, male_area_sum, female_area_sum, total_area_sum, total_area_sum*age_frac, total_area_sum*(1-age_frac)]
-                    unit = 'ha_or_unit'
-                elif sec == 'Total Number of Participants':
-                    values = [total_participants, male_participants, female_participants, total_participants, total_participants*age_frac, total_participants*(1-age_frac)]
-                    unit = 'count'
-                elif sec == 'Value of Sales':
-                    values = [total_val_sum, male_val_sum, female_val_sum, total_val_sum, total_val_sum*age_frac, total_val_sum*(1-age_frac)]
-                    unit = 'USD'
-                else: # Volume of Sales
-                    values = [total_vol_sum, male_vol_sum, female_vol_sum, total_vol_sum, total_vol_sum*age_frac, total_vol_sum*(1-age_frac)]
-                    unit = 'tonne_or_unit'
-
-                disagg = ['Sex', 'Male', 'Female', 'Age', '15-29', '30+']
-                for d, v in zip(disagg, values):
-                    rows.append((commodity_name, commodity_type, sec, d, round(v,2), unit))
-
-            return pd.DataFrame(rows, columns=['Commodity_Name','Commodity_type', 'Sections', 'Disaggregate', 'Result', 'Unit'])
-
-        # --- Corrected Technology Analysis Function ---
-        def compute_technology(df_tech, df_part):
-            rows = []
-
-            # Smallholder Producer, Sex, Age
-            male_total = round(
-                (df_tech.loc[df_tech['items'] == 'Ag_unique_M_Total', 'value'].values[0] *
-                 df_tech.loc[df_tech['items'] == 'overall_ag_Tech_Pecent', 'value'].values[0] / 100) +
-                (df_tech.loc[df_tech['items'] == 'Liv_unique_M_Total', 'value'].values[0] *
-                 df_tech.loc[df_tech['items'] == 'overall_liv_Tech_Pecent', 'value'].values[0] / 100)
-            )
-            female_total = round(
-                (df_tech.loc[df_tech['items'] == 'Ag_unique_F_Total', 'value'].values[0] *
-                 df_tech.loc[df_tech['items'] == 'overall_ag_Tech_Pecent', 'value'].values[0] / 100) +
-                (df_tech.loc[df_tech['items'] == 'Liv_unique_F_Total', 'value'].values[0] *
-                 df_tech.loc[df_tech['items'] == 'overall_liv_Tech_Pecent', 'value'].values[0] / 100)
-            )
-            total = male_total + female_total
-            age_ratio = df_tech.loc[df_tech['items'] == 'Overall_Age_15-29_ratio', 'value'].values[0] / 100
-
-            rows.append(('Smallholder Producer', total))
-            rows.append(('Sex', total))
-            rows.append(('Male', male_total))
-            rows.append(('Female', female_total))
-            rows.append(('Age', total))
-            rows.append(('15-29', round(total * age_ratio, 0)))
-            rows.append(('30+', round(total * (1 - age_ratio), 0)))
-
-            # --- Technology items ---
-            # --- Technology items ---
-            tech_items = df_tech[df_tech['category'].notna() & df_tech['items'].notna()]
-
-            for _, r in tech_items.iterrows():
-                item_name = r['items']
-                cat = str(r['category']).lower()
-                item_percent = r['value'] / 100
-                base = 0
-
-                # --- FIX: handle livestock management separately ---
-                if item_name.lower() == 'livestock management':
-                    base = df_tech.loc[df_tech['items'] == 'Livestock_unique_MF_Total', 'value'].values[0] \
-                           * df_tech.loc[df_tech['items'] == 'overall_liv_Tech_Pecent', 'value'].values[0] / 100
-                else:
-                    if cat == 'agriculture':
-                        base = df_tech.loc[df_tech['items'] == 'Ag_unique_MF_Total', 'value'].values[0] \
-                               * df_tech.loc[df_tech['items'] == 'overall_ag_Tech_Pecent', 'value'].values[0] / 100
-                    elif cat == 'livestock':
-                        base = df_tech.loc[df_tech['items'] == 'Livestock_unique_MF_Total', 'value'].values[0] \
-                               * df_tech.loc[df_tech['items'] == 'overall_liv_Tech_Pecent', 'value'].values[0] / 100
-                    elif cat == 'wild':
-                        base = df_tech.loc[df_tech['items'] == 'Wildcaught_unique_MF_Total', 'value'].values[0]
-                    elif cat == 'aquaculture':
-                        base = df_tech.loc[df_tech['items'] == 'Aqua_unique_MF_Total', 'value'].values[0]
-                    elif cat == 'naturalresource':
-                        base = df_tech.loc[df_tech['items'] == 'NaturalR_unique_MF_Total', 'value'].values[0]
-
-                if base > 0:
-                    result = round(base * item_percent, 0)
-                    rows.append((item_name, result))
-
-            # Add commodity total participants from participants dataset
-            for comm in df_part['commodity_name'].unique():
-                total_comm = df_part.loc[df_part['commodity_name'] == comm, 'totalmf'].sum()
-                rows.append((f'Total Participants - {comm}', total_comm))
-
-            return pd.DataFrame(rows, columns=['Disaggregate/Technology', 'Result'])
-
-
-        # --- Hectare Analysis Function ---
-        def compute_hectare(all_sheets, df_technology):
-            # Step 1 & 2: Pull Total Production Area for agriculture commodities
-            hectare_rows = []
-            commodities_ag = [c for c, df in all_sheets.items()
-                              if 'Commodity_type' in df.columns and df['Commodity_type'].iloc[0] == 'agriculture']
-
-            for comm in commodities_ag:
-                df_comm = all_sheets[comm]
-                total_area = df_comm.loc[(df_comm['Sections'] == 'Production Area') &
-                                         (df_comm['Disaggregate'] == 'Sex'), 'Result'].sum()
-                male_area = df_comm.loc[(df_comm['Sections'] == 'Production Area') &
-                                        (df_comm['Disaggregate'] == 'Male'), 'Result'].sum()
-                female_area = df_comm.loc[(df_comm['Sections'] == 'Production Area') &
-                                          (df_comm['Disaggregate'] == 'Female'), 'Result'].sum()
-                age_area = df_comm.loc[(df_comm['Sections'] == 'Production Area') &
-                                       (df_comm['Disaggregate'] == 'Age'), 'Result'].sum()
-                age_15_29 = df_comm.loc[(df_comm['Sections'] == 'Production Area') &
-                                        (df_comm['Disaggregate'] == '15-29'), 'Result'].sum()
-                age_30_plus = df_comm.loc[(df_comm['Sections'] == 'Production Area') &
-                                          (df_comm['Disaggregate'] == '30+'), 'Result'].sum()
-                total_participants = df_comm.loc[(df_comm['Sections'] == 'Total Number of Participants') &
-                                                 (df_comm['Disaggregate'] == 'Sex'), 'Result'].sum()
-
-                hectare_rows.append({
-                    'Commodity': comm,
-                    'Total participants': total_participants,
-                    'Total Production Area': total_area,
-                    'Total Production Area Male': male_area,
-                    'Total Production Area Female': female_area,
-                    'Total Production Area Age': age_area,
-                    'Total Production Area 15-29': age_15_29,
-                    'Total Production Area 30+': age_30_plus
-                })
-
-            df_hectare = pd.DataFrame(hectare_rows)
-
-            # Step 3: Summary values for Crop land, Sex, Male, Female, Age, 15-29, 30+
-            summary = {
-                'Crop land': df_hectare['Total Production Area'].sum(),
-                'Sex': df_hectare['Total Production Area'].sum(),
-                'Male': df_hectare['Total Production Area Male'].sum(),
-                'Female': df_hectare['Total Production Area Female'].sum(),
-                'Age': df_hectare['Total Production Area Age'].sum(),
-                '15-29': df_hectare['Total Production Area 15-29'].sum(),
-                '30+': df_hectare['Total Production Area 30+'].sum()
-            }
-
-            # Step 4: Technology % applied to Crop land
-            tech_rows = []
-            for _, r in df_technology.iterrows():
-                if str(r['category']).strip().lower() == 'agriculture':
-                    tech_rows.append({
-                        'Disaggregate/Technology': r['items'],
-                        'Result': round(summary['Crop land'] * r['value'] / 100, 2)
-                    })
-            df_tech_calc = pd.DataFrame(tech_rows)
-
-            # Combine hectare summary + technology applied
-            hectare_final_rows = []
-
-            # Add indicator summary
-            for k, v in summary.items():
-                hectare_final_rows.append({'Disaggregate/Technology': k, 'Result': round(v, 2)})
-
-            # Add technology applied
-            for _, row in df_tech_calc.iterrows():
-                hectare_final_rows.append({'Disaggregate/Technology': row['Disaggregate/Technology'],
-                                           'Result': row['Result']})
-
-            # Add commodity-wise participants
-            for _, row in df_hectare.iterrows():
-                hectare_final_rows.append({'Disaggregate/Technology': row['Commodity'],
-                                           'Result': row['Total participants']})
-
-            df_hectare_final = pd.DataFrame(hectare_final_rows)
-            return df_hectare_final
-
+        @st.cache_resource
+        def get_result_cache():
+            # One cache per server process; set HASTY_CACHE_DIR to keep results across restarts
+            return ResultCache(disk_dir=os.environ.get("HASTY_CACHE_DIR"))
+
+        @st.cache_resource
+        def get_base_units():
+            # Built-in unit conversions plus the optional HASTY_UNITS table (.csv/.json/.xlsx);
+            # a workbook's own "units" sheet is layered on top per upload
+            return load_units(os.environ.get("HASTY_UNITS"))
+
+        @st.cache_resource
+        def get_job_runner():
+            # Shared by all sessions: analyses run on these worker threads, so the
+            # script thread stays free to rerun and poll (HASTY_JOB_WORKERS, default 2)
+            return JobRunner(max_workers=int(os.environ.get("HASTY_JOB_WORKERS", 2)))
+
+        def analysis_job(job, entry, fmt, profiler):
+            # Runs on a worker thread, so no st.* calls in here. The analysis fills
+            # the first half of the progress bar and the export, sheet by sheet,
+            # the second (it takes as long or longer).
+            with profiler.stage('run_analysis', rows=len(entry['participants'])):
+                all_sheets = run_analysis(entry['participants'], entry['technology'],
+                                          progress=lambda done, total, message: job.progress(done, 2 * total, message),
+                                          profiler=profiler, validated=True, units=entry['units'])
+            outputs = {}
+            try:
+                with profiler.stage(f'export:{fmt}'):
+                    outputs[fmt] = export_bytes(all_sheets, fmt, progress=lambda done, total, sheet: job.progress(
+                        total + done, 2 * total, f"Writing {output_labels[fmt]}: {sheet}"))
+            except ImportError:
+                pass  # reported by the page when it tries the export itself
+            return {'sheets': all_sheets, 'outputs': outputs, 'profile': profiler.records}
+
+        @st.fragment
+        def show_preview(df, name, page_size, upload_key):
+            # Paging and column picks rerun only this fragment, and only the
+            # visible window is converted for display
+            pages = page_count(df, page_size)
+            left, right = st.columns([3, 1])
+            columns = left.multiselect(f"Columns ({name})", list(df.columns), placeholder="All columns",
+                                       key=f"{name}_columns_{upload_key}")
+            page = right.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                                      key=f"{name}_page_{upload_key}")
+            st.dataframe(preview_page(df, page, page_size, columns))
+            start = (page - 1) * page_size
+            st.caption(f"Rows {start + 1:,}–{min(start + page_size, len(df)):,} of {len(df):,}")
+
+        @st.fragment(run_every=1)
+        def job_progress(job):
+            st.progress(job.fraction, text=f"{job.message} ({job.elapsed:.0f}s)")
+            if not job.running:
+                st.rerun()
+
+        output_labels = {'xlsx': 'Excel (.xlsx)', 'parquet': 'Parquet bundle (.zip)', 'csv': 'CSV bundle (.zip)'}
+
+        # Stage timings are off unless asked for; HASTY_PROFILE_LOG turns them on by
+        # default and appends every stage as a JSON line to that file
+        profile_log = os.environ.get("HASTY_PROFILE_LOG")
+        if profile_log:
+            log_to_file(profile_log)
+        profile_on = st.sidebar.checkbox("⏱️ Profile run (timing & memory)", value=bool(profile_log))
+        trace_on = profile_on and st.sidebar.checkbox("Trace Python allocations (slower)")
 
         # --- File Upload ---
         uploaded_file = st.file_uploader("📂 Upload survey_update.xlsx (sheets: participants + technology)", type=['xlsx'])
         if uploaded_file is not None:
-            try:
-                df_participants = pd.read_excel(uploaded_file, sheet_name="participants")
-                df_technology = pd.read_excel(uploaded_file, sheet_name="technology")
-            except Exception as e:
-                st.error(f"Error reading file: {e}")
-                st.stop()
+            result_cache = get_result_cache()
+            base_units = get_base_units()
+            # Results also depend on the server's unit table. The key is hashed once
+            # per upload, not on every rerun.
+            if st.session_state.get('upload_key', (None,))[0] != uploaded_file.file_id:
+                st.session_state.upload_key = (
+                    uploaded_file.file_id,
+                    cache_key(uploaded_file.getvalue(), base_units.table.to_csv(index=False).encode()))
+            key = st.session_state.upload_key[1]
+            entry = result_cache.get(key)
+            profiler = Profiler(enabled=profile_on, trace_memory=trace_on, upload=uploaded_file.name, key=key)
+            if entry is None:
+                data = uploaded_file.getvalue()
+                try:
+                    with profiler.stage('read_survey'):
+                        df_participants, df_technology, df_units = read_survey(io.BytesIO(data), with_units=True)
+                except Exception as e:
+                    st.error(f"Error reading file: {e}")
+                    st.stop()
+                try:
+                    units = base_units.extend(UnitRegistry.from_frame(df_units)) if df_units is not None else base_units
+                except ValueError as e:
+                    st.error(f"Error in units sheet: {e}")
+                    st.stop()
+                # The engine gets the validated, typed frame; the preview keeps the
+                # parsed sheet from before validation, so flagged rows show blanks,
+                # units and rates as read rather than as cleaned
+                with profiler.stage('validate', rows=len(df_participants)):
+                    df_clean, validation = validate_participants(df_participants, units)
+                entry = {'participants': df_clean, 'raw_participants': df_participants,
+                         'technology': df_technology, 'validation': validation, 'units': units}
+                # Memory only until the results are in: the disk tier is written once
+                result_cache.put(key, entry, disk=False)
+            df_participants, df_technology = entry['participants'], entry['technology']
+            if 'summary' not in entry:
+                entry['summary'] = commodity_summary(df_participants)
+                result_cache.put(key, entry, disk=False)
 
-            df_participants['commodity_name'] = df_participants['commodity_name'].astype(str)
-            commodities = df_participants['commodity_name'].unique().tolist()
             st.sidebar.subheader("Detected commodities:")
-            for c in commodities:
-                st.sidebar.write(f"- {c}")
-
-            if st.button("▶️Run Analysis and Generate Excel"):
-                all_sheets = {}
-                progress = st.progress(0)
-
-                # Commodity sheets
-                for i, comm in enumerate(commodities):
-                    sub = df_participants[df_participants['commodity_name']==comm]
-                    all_sheets[comm] = compute_for_commodity(sub)
-                    progress.progress(int((i+1)/len(commodities)*100))
-
-                # Technology sheet
-                all_sheets['Technology'] = compute_technology(df_technology, df_participants)
-                     # --- Add Hectare sheet ---
-                df_hectare_final = compute_hectare(all_sheets, df_technology)
-                all_sheets['Hectare'] = df_hectare_final
-
-                # Create Excel in memory
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    for sheet_name, sheet_df in all_sheets.items():
-                        safe_name = sheet_name[:31]
-                        sheet_df.to_excel(writer, sheet_name=safe_name, index=False)
-                output.seek(0)
-
-                st.success("✅ Analysis completed. Download the Excel file below.")
+            st.sidebar.markdown("\n".join(f"- {c} ({n:,} rows)" for c, n in entry['summary']['rows'].items()))
+
+            validation = entry['validation']
+            if validation:
+                st.warning(f"⚠️ {flagged_rows(validation):,} of {len(df_participants):,} participant rows broke "
+                           "a validation rule. The analysis still runs; see the details below.")
+                with st.expander("Validation report (row numbers are positions in the participants preview, "
+                                 "where non-numeric cells show as blank)"):
+                    st.dataframe(report_frame(validation), hide_index=True)
+            with st.expander("Unit conversions (value / divisor × factor; add a \"units\" sheet to extend)"):
+                st.dataframe(entry['units'].table, hide_index=True)
+
+            fmt = st.radio("Output format:", list(output_labels), format_func=output_labels.get, horizontal=True)
+
+            # The analysis runs as a background job tracked in session state; reruns
+            # (or stray clicks) while it runs just poll it, and identical uploads
+            # from other sessions share the same job
+            runner = get_job_runner()
+            job = st.session_state.get('analysis_job')
+            if job is not None and job.key != key:
+                job = None
+            if st.button("▶️Run Analysis and Generate Excel", disabled=job is not None and job.running) \
+                    and 'sheets' not in entry:
+                job = st.session_state.analysis_job = runner.submit(
+                    key, analysis_job, entry, fmt,
+                    Profiler(enabled=profile_on, trace_memory=trace_on, upload=uploaded_file.name, key=key))
+
+            if job is not None and 'sheets' not in entry:
+                if job.running:
+                    job_progress(job)
+                elif job.status == 'failed':
+                    if isinstance(job.error, TechnologySheetError):
+                        st.error(f"Error in technology sheet: {job.error}")
+                    else:
+                        st.error(f"Analysis failed: {job.message}")
+                    st.stop()
+                else:
+                    entry['sheets'] = job.result['sheets']
+                    entry.setdefault('outputs', {}).update(job.result['outputs'])
+                    entry.setdefault('profile', []).extend(job.result['profile'])
+                    result_cache.put(key, entry)  # with its sheets: the one disk write
+
+                    runner.discard(key)
+
+            # Results stay available for this upload across reruns and repeat uploads;
+            # each output format is written once, on first request
+            if 'sheets' in entry:
+                outputs = entry.setdefault('outputs', {})
+                if fmt not in outputs:
+                    try:
+                        with profiler.stage(f'export:{fmt}'):
+                            outputs[fmt] = export_bytes(entry['sheets'], fmt)
+                    except ImportError as e:
+                        st.error(f"{output_labels[fmt]} export is not available: {e}")
+                        st.stop()
+                    result_cache.put(key, entry, disk=False)
+
+                ext, mime = output_formats[fmt]
+                st.success("✅ Analysis completed. Download the results below.")
                 st.download_button(
                     "📥 Download Results",
-                    data=output.getvalue(),
-                    file_name='commodity_technology_analysis.xlsx',
-                    mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                    data=outputs[fmt],
+                    file_name=f'commodity_technology_analysis.{ext}',
+                    mime=mime
                 )
+                snapshot_form(entry['sheets'], os.path.splitext(uploaded_file.name)[0], 'analysis')
+
+            # Stages are timed when they actually run; cached results keep the
+            # breakdown from the run that produced them
+            if profiler.records:
+                entry.setdefault('profile', []).extend(profiler.records)
+                result_cache.put(key, entry, disk=False)
+            if profile_on and entry.get('profile'):
+                with st.expander("⏱️ Run profile (timing & memory per stage)"):
+                    st.dataframe([{**r, 'stage': '\u2003' * r['depth'] + r['stage']} for r in entry['profile']],
+                                 hide_index=True)
+                    st.download_button(
+                        "📥 Download profile (JSON)",
+                        data=json.dumps({'upload': uploaded_file.name, 'key': key, 'stages': entry['profile']},
+                                        default=str, indent=2),
+                        file_name='hasty_profile.json',
+                        mime='application/json'
+                    )
 
             st.markdown("---")
-            st.subheader("Preview of uploaded participants data (first 20 rows)")
-            st.dataframe(df_participants.head(20))
+            st.subheader("Commodity summary")
+            st.dataframe(entry['summary'])
 
             st.markdown("---")
-            st.subheader("Preview of uploaded technology data (first 30 rows)")
-            st.dataframe(df_technology.head(31))
+            st.subheader("Preview of uploaded participants data")
+            st.caption("The columns the analysis reads, as parsed before validation: numeric cells that are "
+                       "not numbers show as blank.")
+            show_preview(entry['raw_participants'], "participants", 20, key)
+
+            st.markdown("---")
+            st.subheader("Preview of uploaded technology data")
+            show_preview(df_technology, "technology", 30, key)
 
 
         else:
             st.info("Please upload the HASTY Excel file to begin.")
+
+    # --- Page: Consolidation ---
+    elif option == "Consolidation":
+        st.title("Portfolio Consolidation")
+        st.markdown(
+            "Upload the HASTY workbooks of all implementing partners to build one consolidated ITT. "
+            "Each workbook is reduced to partial totals once; replacing or removing a workbook "
+            "only recomputes that workbook before the consolidated sheets are merged again."
+        )
+
+        if "portfolio" not in st.session_state:
+            st.session_state.portfolio = Portfolio(load_units(os.environ.get("HASTY_UNITS")))
+        portfolio = st.session_state.portfolio
+
+        uploaded_files = st.file_uploader("📂 Upload partner workbooks", type=['xlsx'], accept_multiple_files=True)
+        uploaded_files = uploaded_files or []
+        # Partners share the template's file name: same-named uploads are numbered
+        ids = workbook_ids([f.name for f in uploaded_files])
+        for workbook_id in [w for w in portfolio.workbooks if w not in ids]:
+            portfolio.remove(workbook_id)
+        # Only new or replaced uploads are hashed and, if changed, recomputed
+        known = st.session_state.setdefault("portfolio_files", {})
+        for workbook_id, f in zip(ids, uploaded_files):
+            if known.get(workbook_id) == f.file_id and workbook_id in portfolio.workbooks:
+                continue
+            try:
+                portfolio.update(workbook_id, f.getvalue())
+                known[workbook_id] = f.file_id
+            except Exception as e:
+                st.error(f"Error in {workbook_id}, left out of the consolidation: {e}")
+
+        if portfolio.workbooks:
+            st.subheader("Workbooks in portfolio")
+            st.dataframe(portfolio.summary())
+
+            # Rebuild the consolidated workbook only when the set of workbooks changed
+            keys = tuple(w['key'] for w in portfolio.workbooks.values())
+            if st.session_state.get("consolidated_keys") != keys:
+                st.session_state.consolidated_output = export_bytes(portfolio.sheets())
+                st.session_state.consolidated_keys = keys
+            st.download_button(
+                "📥 Download Consolidated Results",
+                data=st.session_state.consolidated_output,
+                file_name='hasty_consolidated.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+            snapshot_form(portfolio.sheets(), 'portfolio', 'consolidation')
+        else:
+            st.info("Please upload one or more HASTY Excel files to begin.")
+
+    # --- Page: Trends ---
+    elif option == "Trends":
+        st.title("Multi-period Trends")
+        st.markdown(
+            "Compare saved snapshots of HASTY results across reporting periods. Save a snapshot from the "
+            "Analysis or Consolidation page (or `python -m hasty.batch --snapshot PERIOD`); only the "
+            "selected periods, partners and sheets are read back."
+        )
+
+        available = list_snapshots(snapshot_store)
+        if available.empty:
+            st.info(f"No snapshots saved yet (store: `{snapshot_store}`).")
+            st.stop()
+        st.dataframe(available.drop(columns='path'), hide_index=True)
+
+        all_periods = sorted(available['period'].unique())
+        periods = st.multiselect("Periods", all_periods, default=all_periods)
+        partners = st.multiselect("Partners", sorted(available['partner'].unique()), placeholder="All partners")
+        try:
+            sheet_names = load_snapshots(snapshot_store, periods, partners, columns=['sheet'])['sheet'].unique()
+        except ImportError as e:
+            st.error(f"Reading snapshots needs pyarrow: {e}")
+            st.stop()
+        sheets = st.multiselect("Sheets", list(sheet_names), placeholder="All sheets")
+
+        if len(periods) < 2:
+            st.warning("Select at least two periods to compare.")
+        else:
+            snapshots = load_snapshots(snapshot_store, periods, partners, sheets, key_cols + ['value'])
+            trends = trend_sheets(snapshots, periods)
+            st.subheader("Trend")
+            st.dataframe(trends['Trend'], hide_index=True)
+            st.subheader("Variance between consecutive periods")
+            st.dataframe(trends['Variance'], hide_index=True)
+            if 'Duplicates' in trends:
+                st.warning(f"{len(trends['Duplicates']):,} snapshot rows share an indicator key with another row "
+                           "(e.g. a technology item listed twice). They are numbered in the Trend sheet and "
+                           "listed below.")
+                st.dataframe(trends['Duplicates'], hide_index=True)
+            st.download_button(
+                "📥 Download Trends",
+                data=export_bytes(trends),
+                file_name='hasty_trends.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
     if st.sidebar.button("⎋ Logout"):
         st.session_state.logged_in = False
         st.rerun()
@@ -0,0 +1,8 @@
+# HASTY calculation package, shared by the Streamlit app (app.py) and the
+# headless batch mode (python -m hasty.batch). Nothing here imports Streamlit.
+from .engine import compute_for_commodity, compute_hectare, compute_technology, run_analysis
+from .export import export_bytes, write_excel, write_output
+from .ingest import read_survey
+from .instrument import Profiler
+from .units import UnitRegistry, load_units
+from .validate import validate_participants
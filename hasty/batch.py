@@ -0,0 +1,166 @@
+# Headless batch mode: process many survey workbooks across a process pool.
+#
+#   python -m hasty.batch partners/ "2025/*.xlsx" -o outputs/ -j 4
+#
+# The repo is not an installed package: run this from the repo root, or from
+# anywhere with the repo on the path, e.g.
+#
+#   PYTHONPATH=/path/to/hasty python -m hasty.batch ...
+#
+# Writes one <name>_hasty.xlsx (or .zip with --format parquet/csv) per input plus
+# hasty_summary.csv with timings and failures; --profile adds hasty_profile.jsonl
+# with one line per pipeline stage and commodity (see hasty.instrument), and
+# --snapshot PERIOD stores each result for hasty.trends (partner = output name).
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from .engine import run_analysis
+from .export import output_formats, write_output
+from .ingest import read_survey
+from .instrument import Profiler
+from .trends import save_snapshot
+from .units import UnitRegistry, load_units
+from .validate import flagged_rows, validate_participants
+
+
+def find_inputs(patterns):
+    # Directories expand to their *.xlsx files; anything else is treated as a glob
+    paths = []
+    for p in patterns:
+        matches = glob.glob(os.path.join(p, '*.xlsx')) if os.path.isdir(p) else glob.glob(p)
+        paths += sorted(m for m in matches if not os.path.basename(m).startswith('~$'))
+    return list(dict.fromkeys(paths))
+
+
+def output_paths(paths, out_dir, fmt='xlsx'):
+    # <stem>_hasty.<ext>, numbered when two inputs share a file name
+    ext = output_formats[fmt][0]
+    outputs, seen = [], {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        suffix = f"_{seen[stem]}" if seen[stem] > 1 else ""
+        outputs.append(os.path.join(out_dir, f"{stem}{suffix}_hasty.{ext}"))
+    return outputs
+
+
+def process_workbook(path, out_path, fmt='xlsx', profile=False, units=None, snapshot=None):
+    # Runs in a worker process; failures are reported in the summary instead of raised
+    result = {'input': path, 'output': out_path, 'status': 'ok', 'rows': 0, 'commodities': 0,
+              'flagged_rows': 0, 'issues': '', 'read_s': 0.0, 'compute_s': 0.0, 'write_s': 0.0, 'total_s': 0.0, 'error': ''}
+    profiler = Profiler(enabled=profile, input=path)
+    start = time.perf_counter()
+    try:
+        with profiler.stage('read_survey'):
+            df_participants, df_technology, df_units = read_survey(path, with_units=True)
+        units = units or UnitRegistry()
+        if df_units is not None:
+            units = units.extend(UnitRegistry.from_frame(df_units))
+        with profiler.stage('validate', rows=len(df_participants)):
+            df_participants, report = validate_participants(df_participants, units)
+        result['rows'] = len(df_participants)
+        result['flagged_rows'] = flagged_rows(report)
+        result['issues'] = '; '.join(f"{rule} ({len(rows)})" for rule, rows in report.items())
+        t = time.perf_counter()
+        result['read_s'] = t - start
+
+        with profiler.stage('run_analysis', rows=len(df_participants)):
+            all_sheets = run_analysis(df_participants, df_technology, profiler=profiler, validated=True, units=units)
+        result['commodities'] = len(all_sheets) - 2
+        result['compute_s'] = time.perf_counter() - t
+        t = time.perf_counter()
+
+        with profiler.stage(f'export:{fmt}'):
+            write_output(all_sheets, out_path, fmt)
+        if snapshot:
+            store, period = snapshot
+            partner = os.path.basename(out_path).rsplit('_hasty.', 1)[0]
+            with profiler.stage('snapshot'):
+                save_snapshot(all_sheets, store, period, partner)
+        result['write_s'] = time.perf_counter() - t
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['total_s'] = time.perf_counter() - start
+    if profile:
+        result['profile'] = [{'input': path, **r} for r in profiler.records]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m hasty.batch',
+                                     description='Generate HASTY ITT outputs for many survey workbooks.')
+    parser.add_argument('inputs', nargs='+', help='survey .xlsx files, directories or glob patterns')
+    parser.add_argument('-o', '--out-dir', default='hasty_outputs', help='output directory (default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes; 1 runs in-process (default: %(default)s)')
+    parser.add_argument('-f', '--format', choices=list(output_formats), default='xlsx',
+                        help='xlsx workbook, or a zip of one Parquet/CSV file per sheet (default: %(default)s)')
+    parser.add_argument('--profile', action='store_true',
+                        help='write per-stage timings and memory to hasty_profile.jsonl')
+    parser.add_argument('--units', metavar='TABLE',
+                        help='extra unit conversions (.csv, .json or .xlsx "units" sheet); a workbook\'s own '
+                             '"units" sheet overrides them')
+    parser.add_argument('--snapshot', metavar='PERIOD',
+                        help='also store each result as a trend snapshot for this period (needs pyarrow)')
+    parser.add_argument('--snapshot-dir', default='hasty_snapshots',
+                        help='snapshot store for --snapshot (default: %(default)s)')
+    args = parser.parse_args(argv)
+    units = load_units(args.units)
+    snapshot = (args.snapshot_dir, args.snapshot) if args.snapshot else None
+
+    paths = find_inputs(args.inputs)
+    if not paths:
+        parser.error('no .xlsx inputs matched')
+    os.makedirs(args.out_dir, exist_ok=True)
+    jobs = list(zip(paths, output_paths(paths, args.out_dir, args.format)))
+
+    results = []
+    start = time.perf_counter()
+    if args.workers <= 1:
+        for path, out_path in jobs:
+            results.append(process_workbook(path, out_path, args.format, args.profile, units, snapshot))
+            report(results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as pool:
+            futures = [pool.submit(process_workbook, path, out_path, args.format, args.profile, units, snapshot) for path, out_path in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+                report(results[-1])
+    elapsed = time.perf_counter() - start
+
+    if args.profile:
+        profile_path = os.path.join(args.out_dir, 'hasty_profile.jsonl')
+        with open(profile_path, 'w') as f:
+            for result in sorted(results, key=lambda r: r['input']):
+                for record in result.pop('profile'):
+                    f.write(json.dumps(record, default=str) + '\n')
+        print(f"stage profile: {profile_path}")
+
+    summary = pd.DataFrame(results).sort_values('input').round(3)
+    summary_path = os.path.join(args.out_dir, 'hasty_summary.csv')
+    summary.to_csv(summary_path, index=False)
+
+    failed = (summary['status'] != 'ok').sum()
+    print(f"{len(summary) - failed} ok, {failed} failed in {elapsed:.1f}s; summary: {summary_path}")
+    return 1 if failed else 0
+
+
+def report(result):
+    if result['status'] == 'ok':
+        flagged = f", {result['flagged_rows']} flagged" if result['flagged_rows'] else ""
+        print(f"ok      {result['input']} -> {result['output']} "
+              f"({result['rows']} rows{flagged}, {result['total_s']:.2f}s)")
+    else:
+        print(f"failed  {result['input']}: {result['error']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+# Benchmarks for the HASTY pipeline. Results are written as JSON so runs from
+# different versions can be compared.
+#
+#   python -m hasty.bench pipeline --sizes 10000,100000,1000000 --json bench.json
+#   python -m hasty.bench read --sizes 10000,100000 --json read.json
+#   python -m hasty.bench export --commodities 500 --detail-rows 200000 --json export.json
+#   python -m hasty.bench compare before.json after.json --threshold 0.2
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .cache import CALC_VERSION
+from .engine import (aggregate_commodities, commodity_indicators, commodity_table, compute_hectare,
+                     compute_technology, prepare_participants, run_analysis)
+from .export import write_output
+from .ingest import read_survey
+from .synth import make_survey, template_path
+from .validate import validate_participants
+
+
+def measure(fn, *args, memory=True, **kwargs):
+    # (result, seconds, peak traced Python allocation in bytes or None). Timing and memory
+    # come from separate calls because tracemalloc slows allocation-heavy code several times over.
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    if not memory:
+        return result, elapsed, None
+    del result
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def record(benchmark, stage, rows, seconds, peak, **extra):
+    return {'benchmark': benchmark, 'stage': stage, 'rows': rows, 'seconds': round(seconds, 4),
+            'rows_per_s': round(rows / seconds) if seconds else None,
+            'peak_mb': round(peak / 1024 ** 2, 1) if peak is not None else None, **extra}
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(template_path), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'calc_version': CALC_VERSION, 'commit': commit, 'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'machine': platform.machine(), 'args': {k: v for k, v in vars(args).items() if k != 'func'}}
+
+
+# --- Pipeline ---
+def bench_pipeline(rows, commodities=20, tech_items=0, with_io=True, memory=True, seed=0):
+    # Per-stage latency, throughput and peak memory on a synthetic survey of `rows` rows
+    results = []
+    df_participants, df_technology = make_survey(rows, commodities, tech_items, seed)
+
+    def stage(name, fn, *args, **extra):
+        result, seconds, peak = measure(fn, *args, memory=memory)
+        results.append(record('pipeline', name, rows, seconds, peak, commodities=commodities, **extra))
+        return result
+
+    if with_io:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'survey.xlsx')
+            stage('write_input_xlsx', write_output, {'participants': df_participants,
+                                                     'technology': df_technology}, path)
+            df_participants, df_technology = stage('read_survey', read_survey, path,
+                                                   input_mb=round(os.path.getsize(path) / 1024 ** 2, 2))
+
+    # The app's path: validate once, then the engine skips its own coercion
+    df_participants, _ = stage('validate_participants', validate_participants, df_participants)
+    prepared = stage('prepare_participants', prepare_participants, df_participants, True)
+    indicators = stage('aggregate_commodities', lambda: commodity_indicators(aggregate_commodities(prepared)))
+    stage('commodity_tables', lambda: {c: commodity_table(c, r) for c, r in indicators.iterrows()})
+    stage('compute_technology', compute_technology, df_technology, df_participants)
+    stage('compute_hectare', compute_hectare, indicators, df_technology)
+    all_sheets = stage('run_analysis', lambda: run_analysis(df_participants, df_technology, validated=True))
+    for fmt in ('xlsx', 'parquet'):
+        try:
+            stage(f'export_{fmt}', lambda: write_output(all_sheets, io.BytesIO(), fmt))
+        except ImportError as e:
+            results.append({'benchmark': 'pipeline', 'stage': f'export_{fmt}', 'rows': rows, 'error': str(e)})
+    return results
+
+
+# --- Workbook reading ---
+def pandas_double_read(data):
+    # The previous reader: one full pd.read_excel parse of the upload per sheet, kept as the baseline
+    return (pd.read_excel(io.BytesIO(data), sheet_name='participants'),
+            pd.read_excel(io.BytesIO(data), sheet_name='technology'))
+
+
+def bench_read(rows, commodities=20, tech_items=0, memory=True, seed=0):
+    # Double pd.read_excel against the single read-only read_survey pass on the same upload bytes
+    df_participants, df_technology = make_survey(rows, commodities, tech_items, seed)
+    buf = io.BytesIO()
+    write_output({'participants': df_participants, 'technology': df_technology}, buf)
+    data = buf.getvalue()
+    del df_participants, df_technology, buf
+    results = []
+    for name, fn in (('pandas_double_read', pandas_double_read), ('read_survey', lambda d: read_survey(io.BytesIO(d)))):
+        _, seconds, peak = measure(fn, data, memory=memory)
+        results.append(record('read', name, rows, seconds, peak, commodities=commodities,
+                              input_mb=round(len(data) / 1024 ** 2, 2)))
+    return results
+
+
+# --- Export formats ---
+def pandas_excel(all_sheets, target):
+    # The previous writer (pd.ExcelWriter + to_excel + getvalue), kept as the baseline
+    with pd.ExcelWriter(target, engine='xlsxwriter') as writer:
+        for sheet_name, sheet_df in all_sheets.items():
+            sheet_df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+    return target.getvalue()
+
+
+def export_sheets(commodities, detail_rows, seed=0):
+    # Commodity sheets copied from the bundled template, plus one large detail sheet
+    df_participants, df_technology = read_survey(template_path)
+    base = run_analysis(df_participants, df_technology)
+    template = next(iter(base.values()))
+    all_sheets = {f"Commodity {i}": template.assign(Commodity_Name=f"Commodity {i}") for i in range(commodities)}
+    all_sheets['Technology'] = base['Technology']
+    all_sheets['Hectare'] = base['Hectare']
+    if detail_rows:
+        detail = prepare_participants(df_participants)
+        idx = np.random.default_rng(seed).integers(0, len(detail), detail_rows)
+        all_sheets['Detail'] = detail.iloc[idx].reset_index(drop=True)
+    return all_sheets
+
+
+def bench_export(all_sheets, formats=('pandas', 'xlsx', 'parquet', 'csv'), memory=True):
+    rows = int(sum(len(df) for df in all_sheets.values()))
+    results = []
+    for fmt in formats:
+        buf = io.BytesIO()
+        try:
+            if fmt == 'pandas':
+                _, seconds, peak = measure(pandas_excel, all_sheets, buf, memory=memory)
+            else:
+                _, seconds, peak = measure(lambda: (write_output(all_sheets, buf, fmt), buf.getvalue()),
+                                           memory=memory)
+        except ImportError as e:
+            results.append({'benchmark': 'export', 'stage': fmt, 'rows': rows, 'error': str(e)})
+            continue
+        results.append(record('export', fmt, rows, seconds, peak, sheets=len(all_sheets),
+                              size_mb=round(buf.getbuffer().nbytes / 1024 ** 2, 2)))
+    return results
+
+
+# --- Comparison ---
+def compare(before, after, threshold=0.2):
+    # Join two result files on (benchmark, stage, rows); flag stages slower by more than threshold
+    key = ['benchmark', 'stage', 'rows']
+    old = pd.DataFrame(before['results']).dropna(subset=['seconds'])
+    new = pd.DataFrame(after['results']).dropna(subset=['seconds'])
+    both = old[key + ['seconds', 'peak_mb']].merge(new[key + ['seconds', 'peak_mb']], on=key,
+                                                    suffixes=('_before', '_after'))
+    both['time_ratio'] = (both['seconds_after'] / both['seconds_before']).round(3)
+    both['regression'] = both['time_ratio'] > 1 + threshold
+    return both
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m hasty.bench', description='HASTY benchmarks.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('pipeline', help='per-stage latency, throughput and peak memory at several sizes')
+    p.add_argument('--sizes', default='10000,100000,1000000', help='participants rows (default: %(default)s)')
+    p.add_argument('--commodities', type=int, default=20)
+    p.add_argument('--tech-items', type=int, default=0)
+    p.add_argument('--no-io', action='store_true', help='skip writing and reading the synthetic xlsx')
+
+    p = sub.add_parser('read', help='double pd.read_excel (previous reader) against read_survey')
+    p.add_argument('--sizes', default='10000,100000', help='participants rows (default: %(default)s)')
+    p.add_argument('--commodities', type=int, default=20)
+    p.add_argument('--tech-items', type=int, default=0)
+
+    p = sub.add_parser('export', help='time and peak memory of each output format')
+    p.add_argument('--commodities', type=int, default=200)
+    p.add_argument('--detail-rows', type=int, default=100_000)
+    p.add_argument('--formats', default='pandas,xlsx,parquet,csv')
+
+    for p in sub.choices.values():
+        p.add_argument('--no-memory', action='store_true', help='skip the traced run used for peak memory')
+        p.add_argument('--json', help='also write the results to this file')
+
+    p = sub.add_parser('compare', help='compare two --json result files')
+    p.add_argument('before')
+    p.add_argument('after')
+    p.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown ratio (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.before) as f1, open(args.after) as f2:
+            table = compare(json.load(f1), json.load(f2), args.threshold)
+        print(table.to_string(index=False))
+        return 1 if table['regression'].any() else 0
+
+    memory = not args.no_memory
+    if args.command == 'pipeline':
+        results = []
+        for size in [int(s) for s in args.sizes.split(',')]:
+            results += bench_pipeline(size, args.commodities, args.tech_items, not args.no_io, memory)
+    elif args.command == 'read':
+        results = []
+        for size in [int(s) for s in args.sizes.split(',')]:
+            results += bench_read(size, args.commodities, args.tech_items, memory)
+    else:
+        results = bench_export(export_sheets(args.commodities, args.detail_rows), args.formats.split(','), memory)
+
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': metadata(args), 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# Content-hash cache of parsed frames, computed sheets and output bytes.
+import contextlib
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# Bump when the calculation logic changes so older cached results are not reused
+CALC_VERSION = "2"
+
+
+def cache_key(*parts: bytes) -> str:
+    # Hash of the parts in order, fed one at a time (no concatenated copy)
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part)
+    return f"{CALC_VERSION}-{h.hexdigest()}"
+
+
+def entry_size(entry) -> int:
+    size = 0
+    for v in entry.values():
+        if isinstance(v, pd.DataFrame):
+            size += int(v.memory_usage(deep=True).sum())
+        elif isinstance(v, dict):
+            size += entry_size(v)
+        elif isinstance(v, (bytes, bytearray)):
+            size += len(v)
+        elif isinstance(v, np.ndarray):
+            size += v.nbytes
+    return size
+
+
+class ResultCache:
+    # LRU of parsed frames, computed sheets and output bytes keyed by upload hash,
+    # bounded by entry count and size, with an optional pickle tier on disk
+    def __init__(self, max_entries=8, max_bytes=512 * 1024 ** 2, disk_dir=None, disk_max_bytes=2 * 1024 ** 3):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if not self.disk_dir or not os.path.exists(self._disk_path(key)):
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(self._disk_path(key))
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry, disk=True):
+        # disk=False only updates the memory tier: pickling a large entry is costly,
+        # so callers write it to disk once it holds what is worth keeping
+        self._remember(key, entry)
+        if self.disk_dir and disk:
+            # A private temp file per writer: sessions share the cache and may put
+            # the same key at once
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, prefix=f".{key}.", suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._disk_path(key))
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)
+                raise
+            self._prune_disk()
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._sizes[key] = entry_size(entry)
+            # Evict least recently used, but always keep the newest entry
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                              or sum(self._sizes.values()) > self.max_bytes):
+                old, _ = self._entries.popitem(last=False)
+                self._sizes.pop(old, None)
+
+    def _prune_disk(self):
+        # Other threads may prune or replace the same files meanwhile: a file that
+        # is already gone is simply skipped
+        files = []
+        for n in os.listdir(self.disk_dir):
+            if n.endswith('.pkl'):
+                with contextlib.suppress(FileNotFoundError):
+                    st = os.stat(os.path.join(self.disk_dir, n))
+                    files.append((st.st_mtime, st.st_size, os.path.join(self.disk_dir, n)))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        while len(files) > 1 and total > self.disk_max_bytes:
+            _, size, p = files.pop(0)
+            total -= size
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(p)
@@ -0,0 +1,178 @@
+# Portfolio consolidation: keep per-workbook partial aggregates and merge them
+# into one consolidated ITT, so a resubmitted workbook is the only one recomputed.
+#
+#   python -m hasty.consolidate -s portfolio.pkl -o consolidated.xlsx partners/*.xlsx
+import argparse
+import io
+import os
+import pickle
+import sys
+
+import pandas as pd
+
+from .cache import cache_key
+from .engine import (aggregate_commodities, commodity_indicators, commodity_table, compute_technology,
+                     hectare_table, hectare_technology, prepare_participants)
+from .export import write_excel
+from .ingest import read_survey
+from .units import UnitRegistry, load_units
+from .validate import flagged_rows, validate_participants
+
+
+def workbook_partials(df_participants, df_technology, validated=False, units=None):
+    # Everything the consolidated sheets need from one workbook, all additive
+    totals = aggregate_commodities(prepare_participants(df_participants, validated, units))
+    technology = compute_technology(df_technology, df_participants)
+    return {
+        'rows': len(df_participants),
+        'totals': totals,
+        'technology': technology.set_index('Disaggregate/Technology')['Result'],
+        'tech_hectares': hectare_technology(commodity_indicators(totals), df_technology),
+    }
+
+
+def merge_partials(partials):
+    # Consolidated commodity, Technology and Hectare sheets from workbook partials
+    totals = pd.concat([p['totals'] for p in partials])
+    grouped = totals.groupby(level=0, sort=False)
+    merged = grouped[[c for c in totals.columns if c != 'commodity_type']].sum()
+    merged['commodity_type'] = grouped['commodity_type'].first()
+    indicators = commodity_indicators(merged)
+
+    all_sheets = {}
+    for comm, r in indicators.iterrows():
+        all_sheets[comm] = commodity_table(comm, r)
+
+    technology = pd.concat([p['technology'] for p in partials]).groupby(level=0, sort=False).sum()
+    all_sheets['Technology'] = pd.DataFrame({'Disaggregate/Technology': technology.index,
+                                             'Result': technology.to_numpy()})
+    tech_hectares = pd.concat([p['tech_hectares'] for p in partials]).groupby(level=0, sort=False).sum()
+    all_sheets['Hectare'] = hectare_table(indicators, tech_hectares)
+    return all_sheets
+
+
+def workbook_ids(names):
+    # Unique ids for uploaded file names: partners fill in the same template, so
+    # repeats are numbered ("survey_update.xlsx", "survey_update (2).xlsx", ...)
+    ids, seen = [], {}
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        stem, ext = os.path.splitext(name)
+        ids.append(f"{stem} ({seen[name]}){ext}" if seen[name] > 1 else name)
+    return ids
+
+
+class Portfolio:
+    # Workbook id -> content key and partials; merged sheets are rebuilt only after a change.
+    # units is the base UnitRegistry, extended by each workbook's own "units" sheet.
+    def __init__(self, units=None):
+        self.workbooks = {}
+        self.units = units or UnitRegistry()
+        self._units_csv = self.units.table.to_csv(index=False).encode()
+        self._units_key = cache_key(self._units_csv)
+        self._sheets = None
+
+    def update(self, workbook_id, data: bytes) -> bool:
+        # Returns False when this exact workbook is already in the portfolio under
+        # the same base unit table (results also depend on it). A workbook that
+        # fails to compute is dropped, so its old partials do not stay merged.
+        key = cache_key(data, self._units_csv)
+        current = self.workbooks.get(workbook_id)
+        if current is not None and current['key'] == key:
+            return False
+        try:
+            df_participants, df_technology, df_units = read_survey(io.BytesIO(data), with_units=True)
+            units = self.units.extend(UnitRegistry.from_frame(df_units)) if df_units is not None else self.units
+            df_participants, report = validate_participants(df_participants, units)
+            partials = workbook_partials(df_participants, df_technology, validated=True, units=units)
+        except Exception:
+            self.remove(workbook_id)
+            raise
+        self.workbooks[workbook_id] = {'key': key, 'units_key': self._units_key,
+                                       'flagged_rows': flagged_rows(report), 'partials': partials}
+        self._sheets = None
+        return True
+
+    def stale(self):
+        # Workbooks computed under a different base unit table; they are only
+        # recomputed when their file is supplied again
+        return [wid for wid, w in self.workbooks.items() if w.get('units_key') != self._units_key]
+
+    def remove(self, workbook_id):
+        if self.workbooks.pop(workbook_id, None) is not None:
+            self._sheets = None
+
+    def sheets(self):
+        if not self.workbooks:
+            raise ValueError("portfolio has no workbooks")
+        if self._sheets is None:
+            self._sheets = merge_partials([w['partials'] for w in self.workbooks.values()])
+        return self._sheets
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame([{'Workbook': wid,
+                              'Rows': w['partials']['rows'],
+                              'Commodities': len(w['partials']['totals']),
+                              'Flagged rows': w.get('flagged_rows', 0),
+                              'Content key': w['key'][:14]} for wid, w in self.workbooks.items()])
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self.workbooks, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, units=None):
+        portfolio = cls(units)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                portfolio.workbooks = pickle.load(f)
+        return portfolio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m hasty.consolidate',
+                                     description='Consolidate HASTY results across partner workbooks.')
+    parser.add_argument('inputs', nargs='*',
+                        help='partner .xlsx files to add or refresh (id = path relative to the working directory)')
+    parser.add_argument('-s', '--state', default='hasty_portfolio.pkl',
+                        help='portfolio state file holding the partials (default: %(default)s)')
+    parser.add_argument('-o', '--output', default='hasty_consolidated.xlsx',
+                        help='consolidated workbook (default: %(default)s)')
+    parser.add_argument('--remove', action='append', default=[], metavar='ID', help='drop a workbook by id')
+    parser.add_argument('--units', metavar='TABLE', help='extra unit conversions (.csv, .json or .xlsx "units" sheet)')
+    args = parser.parse_args(argv)
+
+    portfolio = Portfolio.load(args.state, load_units(args.units))
+    for workbook_id in map(os.path.normpath, args.remove):
+        portfolio.remove(workbook_id)
+        print(f"removed    {workbook_id}")
+
+    failed = 0
+    for path in args.inputs:
+        # Partners share the template's file name, so the id keeps the directory
+        workbook_id = os.path.normpath(os.path.relpath(path))
+        try:
+            with open(path, 'rb') as f:
+                changed = portfolio.update(workbook_id, f.read())
+        except Exception as e:
+            failed += 1
+            print(f"failed     {workbook_id}: {type(e).__name__}: {e} (left out)", file=sys.stderr)
+            continue
+        print(f"{'recomputed' if changed else 'unchanged '} {workbook_id}")
+
+    for workbook_id in portfolio.stale():
+        print(f"stale      {workbook_id}: computed with a different unit table; supply it again to recompute",
+              file=sys.stderr)
+    portfolio.save(args.state)
+    if not portfolio.workbooks:
+        print("portfolio is empty; nothing written")
+        return 1
+    write_excel(portfolio.sheets(), args.output)
+    print(f"{len(portfolio.workbooks)} workbook(s) consolidated into {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
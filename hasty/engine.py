@@ -0,0 +1,284 @@
+# HASTY calculation engine: commodity, Technology and Hectare indicators.
+# Free of Streamlit so the app and the batch CLI share the same code path.
+import numpy as np
+import pandas as pd
+
+from .instrument import no_stage
+from .units import default_units
+
+
+# --- Commodity Analysis Functions ---
+numeric_cols = ["male", "female", "totalmf", "Age_15-29_ratio",
+                "production_area", "total_production",
+                "quantity_sales", "value_sales", "per_dollar_rate"]
+sum_cols = ['male', 'female', 'totalmf', 'age_weighted',
+            'male_prod_contrib', 'female_prod_contrib',
+            'male_area_contrib', 'female_area_contrib',
+            'male_vol_sales', 'female_vol_sales',
+            'male_val_sales', 'female_val_sales']
+
+
+def prepare_participants(df_part: pd.DataFrame, validated=False, units=None) -> pd.DataFrame:
+    # Coerce and enrich the whole participants frame once; a frame cleaned by
+    # hasty.validate is already numeric and is not coerced again. Units convert
+    # through a hasty.units.UnitRegistry (the built-in conversions by default).
+    df = df_part.copy()
+    if not validated:
+        for c in numeric_cols:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+
+    def num(col, default=0.0):
+        if col in df.columns:
+            return df[col].to_numpy(dtype=float)
+        return np.full(len(df), default)
+
+    # Per-row factor/divisor arrays, looked up once per distinct (type, unit) pair
+    factors = (units or default_units).compile(df)
+    prod_mul, prod_div, _ = factors['production']
+    area_mul, area_div, _ = factors['area']
+    vol_mul, vol_div, _ = factors['sales']
+
+    tp = num('total_production')
+    pa = num('production_area')
+    qty = num('quantity_sales')
+    val = num('value_sales')
+    per_rate = num('per_dollar_rate', 1.0)
+
+    def round2(x):
+        # np.round is not correctly rounded on near-ties; defer those to round()
+        out = np.round(x, 2)
+        scaled = x * 100
+        tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        out[tie] = [round(v, 2) for v in x[tie].tolist()]
+        return out
+
+    for sex in ('male', 'female'):
+        count = num(sex)
+        df[f'{sex}_prod_contrib'] = count * tp / prod_div * prod_mul
+        df[f'{sex}_area_contrib'] = count * pa / area_div * area_mul
+        df[f'{sex}_vol_sales'] = count * qty / vol_div * vol_mul
+        df[f'{sex}_val_sales'] = round2(count * val / per_rate)
+
+    # Numerator of the totalmf-weighted age ratio
+    df['age_weighted'] = df['Age_15-29_ratio'] * df['totalmf']
+    return df
+
+
+def aggregate_commodities(df: pd.DataFrame) -> pd.DataFrame:
+    # One groupby pass: per-commodity sums in order of first appearance
+    grouped = df.groupby('commodity_name', sort=False)
+    totals = grouped[sum_cols].sum()
+    # Kept as sum and count (not a mean) so partial totals can be merged exactly
+    totals['age_sum'] = grouped['Age_15-29_ratio'].sum()
+    totals['age_count'] = grouped['Age_15-29_ratio'].count()
+    first_rows = df.drop_duplicates('commodity_name').set_index('commodity_name')
+    totals['commodity_type'] = first_rows['commodity_type']
+    return totals
+
+
+# Indicator sections: (section, key, male column, female column, unit)
+indicator_sections = [
+    ('Total Production', 'prod', 'male_prod_contrib', 'female_prod_contrib', 'tonne_or_unit'),
+    ('Production Area', 'area', 'male_area_contrib', 'female_area_contrib', 'ha_or_unit'),
+    ('Total Number of Participants', 'participants', 'male', 'female', 'count'),
+    ('Value of Sales', 'value', 'male_val_sales', 'female_val_sales', 'USD'),
+    ('Volume of Sales', 'volume', 'male_vol_sales', 'female_vol_sales', 'tonne_or_unit'),
+]
+
+
+def commodity_indicators(totals: pd.DataFrame) -> pd.DataFrame:
+    # Unrounded indicator record per commodity, shared by the commodity and Hectare sheets
+    ind = pd.DataFrame(index=totals.index)
+    ind['commodity_type'] = totals['commodity_type'].astype(str).str.strip().str.lower()
+
+    # Age ratio: totalmf-weighted, falling back to the plain mean
+    age_mean = totals['age_sum'] / totals['age_count']
+    age_ratio = (totals['age_weighted'] / totals['totalmf']).where(totals['totalmf'] > 0, age_mean)
+    ind['age_frac'] = (age_ratio.astype(float) / 100.0).fillna(0.0)
+
+    for _, key, male_col, female_col, _ in indicator_sections:
+        total = totals[male_col] + totals[female_col]
+        ind[f'{key}_total'] = total
+        ind[f'{key}_male'] = totals[male_col]
+        ind[f'{key}_female'] = totals[female_col]
+        ind[f'{key}_15_29'] = total * ind['age_frac']
+        ind[f'{key}_30_plus'] = total * (1 - ind['age_frac'])
+
+    # Overall Yield
+    area = ind['area_total'].where(ind['area_total'] != 0)
+    ind['yield'] = (ind['prod_total'] / area).fillna(0)
+    return ind
+
+
+def commodity_table(commodity_name, r) -> pd.DataFrame:
+    # Build Results
+    commodity_type = r['commodity_type']
+    rows = [(commodity_name, commodity_type, 'Overall', 'Yield', np.round(float(r['yield']), 2), 'Yield')]
+
+    # Production, Area, Participants, Value, Volume
+    disagg = ['Sex', 'Male', 'Female', 'Age', '15-29', '30+']
+    for sec, key, _, _, unit in indicator_sections:
+        values = [r[f'{key}_total'], r[f'{key}_male'], r[f'{key}_female'],
+                  r[f'{key}_total'], r[f'{key}_15_29'], r[f'{key}_30_plus']]
+        for d, v in zip(disagg, np.round(np.array(values, dtype=float), 2)):
+            rows.append((commodity_name, commodity_type, sec, d, v, unit))
+
+    return pd.DataFrame(rows, columns=['Commodity_Name','Commodity_type', 'Sections', 'Disaggregate', 'Result', 'Unit'])
+
+
+def compute_for_commodity(df_comm: pd.DataFrame) -> pd.DataFrame:
+    # Single-commodity entry point; the Analysis run uses the batched path
+    df = prepare_participants(df_comm).assign(commodity_name=df_comm['commodity_name'].iloc[0])
+    ind = commodity_indicators(aggregate_commodities(df))
+    return commodity_table(ind.index[0], ind.iloc[0])
+
+
+# --- Corrected Technology Analysis Function ---
+# Base denominator per technology category: (participants item, tech-percent item or None)
+tech_bases = {
+    'agriculture': ('Ag_unique_MF_Total', 'overall_ag_Tech_Pecent'),
+    'livestock': ('Livestock_unique_MF_Total', 'overall_liv_Tech_Pecent'),
+    'wild': ('Wildcaught_unique_MF_Total', None),
+    'aquaculture': ('Aqua_unique_MF_Total', None),
+    'naturalresource': ('NaturalR_unique_MF_Total', None),
+}
+
+
+class TechnologySheetError(ValueError):
+    # The technology sheet lacks items the Hectare and Technology sheets need
+    pass
+
+
+def tech_lookup(df_tech, required):
+    # One-time items -> value index; the first occurrence wins, as with .values[0]
+    lookup = df_tech.dropna(subset=['items']).drop_duplicates('items').set_index('items')['value']
+    missing = [k for k in dict.fromkeys(required) if k not in lookup.index]
+    if missing:
+        raise TechnologySheetError(f"technology sheet is missing item(s): {', '.join(missing)}")
+    return lookup
+
+
+def compute_technology(df_tech, df_part):
+    rows = []
+    tech_items = df_tech[df_tech['category'].notna() & df_tech['items'].notna()]
+    cats = tech_items['category'].astype(str).str.lower()
+    # --- FIX: handle livestock management separately ---
+    is_liv_mgmt = tech_items['items'].astype(str).str.lower() == 'livestock management'
+
+    used = [c for c in tech_bases if (cats == c).any()]
+    if is_liv_mgmt.any() and 'livestock' not in used:
+        used.append('livestock')
+    required = ['Ag_unique_M_Total', 'Ag_unique_F_Total', 'Liv_unique_M_Total', 'Liv_unique_F_Total',
+                'overall_ag_Tech_Pecent', 'overall_liv_Tech_Pecent', 'Overall_Age_15-29_ratio']
+    required += [k for c in used for k in tech_bases[c] if k is not None]
+    v = tech_lookup(df_tech, required)
+
+    # Smallholder Producer, Sex, Age
+    male_total = round(
+        (v['Ag_unique_M_Total'] * v['overall_ag_Tech_Pecent'] / 100) +
+        (v['Liv_unique_M_Total'] * v['overall_liv_Tech_Pecent'] / 100)
+    )
+    female_total = round(
+        (v['Ag_unique_F_Total'] * v['overall_ag_Tech_Pecent'] / 100) +
+        (v['Liv_unique_F_Total'] * v['overall_liv_Tech_Pecent'] / 100)
+    )
+    total = male_total + female_total
+    age_ratio = v['Overall_Age_15-29_ratio'] / 100
+
+    rows.append(('Smallholder Producer', total))
+    rows.append(('Sex', total))
+    rows.append(('Male', male_total))
+    rows.append(('Female', female_total))
+    rows.append(('Age', total))
+    rows.append(('15-29', round(total * age_ratio, 0)))
+    rows.append(('30+', round(total * (1 - age_ratio), 0)))
+
+    # --- Technology items ---
+    bases = {}
+    for c in used:
+        count_key, pct_key = tech_bases[c]
+        bases[c] = v[count_key] * v[pct_key] / 100 if pct_key else v[count_key]
+    base = cats.map(bases).astype(float).fillna(0)
+    if is_liv_mgmt.any():
+        base[is_liv_mgmt] = bases['livestock']
+    results = (base * (tech_items['value'] / 100)).round(0)
+    keep = base > 0
+    rows.extend(zip(tech_items.loc[keep, 'items'], results[keep]))
+
+    # Add commodity total participants from participants dataset
+    totals = df_part.groupby('commodity_name', sort=False)['totalmf'].sum()
+    for comm, total_comm in totals.items():
+        rows.append((f'Total Participants - {comm}', total_comm))
+
+    return pd.DataFrame(rows, columns=['Disaggregate/Technology', 'Result'])
+
+
+# --- Hectare Analysis Function ---
+def hectare_technology(indicators, df_technology) -> pd.Series:
+    # Unrounded hectares under each agriculture technology: crop land x adoption %
+    crop_land = indicators.loc[indicators['commodity_type'] == 'agriculture', 'area_total'].sum()
+    tech = df_technology[df_technology['category'].astype(str).str.strip().str.lower() == 'agriculture']
+    return pd.Series((crop_land * tech['value'] / 100).to_numpy(dtype=float), index=tech['items'].to_numpy())
+
+
+def hectare_table(indicators, tech_hectares):
+    # Step 1 & 2: Production Area of agriculture commodities, straight from the unrounded indicators
+    ag = indicators[indicators['commodity_type'] == 'agriculture']
+
+    # Step 3: Summary values for Crop land, Sex, Male, Female, Age, 15-29, 30+
+    summary = {
+        'Crop land': ag['area_total'].sum(),
+        'Sex': ag['area_total'].sum(),
+        'Male': ag['area_male'].sum(),
+        'Female': ag['area_female'].sum(),
+        'Age': ag['area_total'].sum(),
+        '15-29': ag['area_15_29'].sum(),
+        '30+': ag['area_30_plus'].sum()
+    }
+
+    # Step 4: Technology % applied to Crop land (see hectare_technology)
+    tech_results = tech_hectares.round(2)
+
+    # Combine indicator summary + technology applied + commodity-wise participants
+    names = list(summary) + tech_results.index.tolist() + ag.index.tolist()
+    results = np.concatenate([np.round(np.array(list(summary.values()), dtype=float), 2),
+                              tech_results.to_numpy(dtype=float),
+                              ag['participants_total'].to_numpy(dtype=float)])
+    return pd.DataFrame({'Disaggregate/Technology': names, 'Result': results})
+
+
+def compute_hectare(indicators, df_technology):
+    return hectare_table(indicators, hectare_technology(indicators, df_technology))
+
+
+# --- Full Analysis ---
+def run_analysis(df_participants, df_technology, progress=None, profiler=None, validated=False, units=None):
+    # Every output sheet in workbook order; progress(done, total, message) is called
+    # as each stage starts and per commodity, with done out of 100 (prepare and
+    # aggregate take most of the time), and each stage is timed when a
+    # hasty.instrument.Profiler is passed. validated=True takes the clean frame from
+    # hasty.validate.validate_participants; units is a hasty.units.UnitRegistry.
+    stage = profiler.stage if profiler is not None else no_stage
+    report = progress or (lambda done, total, message: None)
+    all_sheets = {}
+
+    # Commodity sheets: coerce/enrich once, aggregate in one groupby pass
+    report(0, 100, "Preparing participants")
+    with stage('prepare', rows=len(df_participants)):
+        df = prepare_participants(df_participants, validated, units)
+    report(40, 100, "Aggregating commodities")
+    with stage('aggregate', rows=len(df)):
+        indicators = commodity_indicators(aggregate_commodities(df))
+    for i, (comm, r) in enumerate(indicators.iterrows()):
+        with stage(f'commodity:{comm}'):
+            all_sheets[comm] = commodity_table(comm, r)
+        report(70 + 20 * (i + 1) // len(indicators), 100, f"Commodity sheets: {i + 1} of {len(indicators)}")
+
+    report(90, 100, "Technology and Hectare sheets")
+    with stage('technology', rows=len(df_technology)):
+        all_sheets['Technology'] = compute_technology(df_technology, df_participants)
+    with stage('hectare'):
+        all_sheets['Hectare'] = compute_hectare(indicators, df_technology)
+    report(100, 100, "Analysis done")
+    return all_sheets
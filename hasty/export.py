@@ -0,0 +1,88 @@
+# Output writers: streaming xlsx plus zipped Parquet/CSV bundles of the same sheets.
+import io
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# format -> (file extension, mime type)
+output_formats = {
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ('zip', 'application/zip'),
+    'csv': ('zip', 'application/zip'),
+}
+
+
+def excel_rows(sheet_df, chunk_rows=10_000):
+    # Rows as Python scalars, converted a chunk at a time so a large sheet is never
+    # held as objects all at once. As to_excel writes them: NaN is None (a blank
+    # cell) and +/-inf the strings 'inf'/'-inf'.
+    for start in range(0, len(sheet_df), chunk_rows):
+        chunk = sheet_df.iloc[start:start + chunk_rows]
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for j in range(chunk.shape[1]):
+            if pd.api.types.is_float_dtype(chunk.dtypes.iloc[j]):
+                col = chunk.iloc[:, j].to_numpy(dtype=float, na_value=np.nan)
+                inf = np.isinf(col)
+                if inf.any():
+                    values.iloc[:, j] = np.where(inf, np.where(col > 0, 'inf', '-inf'), values.iloc[:, j].to_numpy())
+        yield from values.itertuples(index=False, name=None)
+
+
+def write_excel(all_sheets, target, progress=None):
+    # target is a path or a writable binary buffer. constant_memory flushes each row
+    # to a temp file as it is written, so rows must be streamed in order (pandas'
+    # to_excel writes column by column and would lose cells in this mode).
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    for n, (sheet_name, sheet_df) in enumerate(all_sheets.items()):
+        if progress:
+            progress(n, len(all_sheets), sheet_name)
+        ws = workbook.add_worksheet(sheet_name[:31])
+        ws.write_row(0, 0, [str(c) for c in sheet_df.columns], header_format)
+        for i, row in enumerate(excel_rows(sheet_df), start=1):
+            ws.write_row(i, 0, row)
+    workbook.close()
+
+
+def bundle_name(sheet_name):
+    return re.sub(r'[^\w\-. ]', '_', sheet_name).strip() or 'sheet'
+
+
+def write_bundle(all_sheets, target, fmt='csv', progress=None):
+    # One <sheet>.csv or <sheet>.parquet per sheet inside a zip; Parquet needs pyarrow
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        seen = set()
+        for n, (sheet_name, sheet_df) in enumerate(all_sheets.items()):
+            if progress:
+                progress(n, len(all_sheets), sheet_name)
+            name = bundle_name(sheet_name)
+            while name in seen:
+                name += '_'
+            seen.add(name)
+            if fmt == 'csv':
+                with zf.open(f"{name}.csv", 'w') as f, io.TextIOWrapper(f, encoding='utf-8', newline='') as text:
+                    sheet_df.to_csv(text, index=False)
+            elif fmt == 'parquet':
+                with zf.open(f"{name}.parquet", 'w') as f:
+                    sheet_df.to_parquet(f, index=False)
+            else:
+                raise ValueError(f"unknown bundle format: {fmt}")
+
+
+def write_output(all_sheets, target, fmt='xlsx', progress=None):
+    # progress(done, total, sheet_name) is called as each sheet starts
+    if fmt == 'xlsx':
+        write_excel(all_sheets, target, progress)
+    else:
+        write_bundle(all_sheets, target, fmt, progress)
+
+
+def export_bytes(all_sheets, fmt='xlsx', progress=None) -> bytes:
+    # BytesIO.getvalue() returns the buffer's own bytes object (no copy in CPython), and the
+    # buffer goes away with this frame, so only one copy of the output is ever held
+    output = io.BytesIO()
+    write_output(all_sheets, output, fmt, progress)
+    return output.getvalue()
@@ -0,0 +1,73 @@
+# Streaming, read-only ingestion of HASTY survey workbooks.
+import openpyxl
+import pandas as pd
+
+from .engine import numeric_cols
+
+
+# Columns the commodity engine reads from the participants sheet
+participant_cols = ['commodity_name', 'commodity_type', 'parea_unit', 'tp_unit', 'qsales_unit'] + numeric_cols
+category_cols = ['commodity_type', 'parea_unit', 'tp_unit', 'qsales_unit']
+count_cols = ['male', 'female', 'totalmf']
+
+
+def read_sheet(ws, usecols=None, convert=None, chunk_rows=50_000) -> pd.DataFrame:
+    # Stream rows from a read-only worksheet, keeping only the wanted columns.
+    # Rows are converted to frames in chunks so raw cell values never pile up.
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, ())
+    idx = [i for i, h in enumerate(header) if h is not None and (usecols is None or h in usecols)]
+    names = [str(header[i]) for i in idx]
+    width = len(header)
+
+    def to_frame(records):
+        chunk = pd.DataFrame.from_records(records, columns=names)
+        return convert(chunk) if convert else chunk
+
+    chunks, records = [], []
+    for row in rows:
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        rec = [row[i] for i in idx]
+        if any(v is not None for v in rec):
+            records.append(rec)
+        if len(records) >= chunk_rows:
+            chunks.append(to_frame(records))
+            records = []
+    chunks.append(to_frame(records))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def coerce_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    for c in numeric_cols:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+    return df
+
+
+def compact_participants(df: pd.DataFrame) -> pd.DataFrame:
+    # Integer counts are downcast; measurements stay float64 so results don't shift
+    for c in count_cols:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], downcast='integer')
+    for c in category_cols:
+        if c in df.columns:
+            df[c] = df[c].astype('category')
+    if 'commodity_name' in df.columns:
+        df['commodity_name'] = df['commodity_name'].astype(str)
+    return df
+
+
+def read_survey(file, with_units=False):
+    # Open the workbook once, read-only, and return (participants, technology), plus
+    # its optional "units" conversion sheet (or None) when with_units is set
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        df_part = read_sheet(wb['participants'], participant_cols, coerce_numeric)
+        df_tech = read_sheet(wb['technology'])
+        df_units = read_sheet(wb['units']) if with_units and 'units' in wb.sheetnames else None
+    finally:
+        wb.close()
+    if with_units:
+        return compact_participants(df_part), df_tech, df_units
+    return compact_participants(df_part), df_tech
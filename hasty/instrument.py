@@ -0,0 +1,123 @@
+# Optional per-stage timing and memory profile of a run.
+#
+#   profiler = Profiler(trace_memory=True)
+#   with profiler.stage('read_survey'):
+#       ...
+#   profiler.to_json()
+#
+# Code under measurement takes profiler=None and uses no_stage instead, so a run
+# without profiling pays one no-op context manager per stage.
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+log = logging.getLogger('hasty.profile')
+
+MB = 1024 ** 2
+
+_null = contextlib.nullcontext()
+
+# tracemalloc is process-wide with a single peak: traced stage trees (e.g. jobs
+# on the JobRunner pool) take turns rather than reset and stop it under each other
+_trace_lock = threading.RLock()
+
+
+def no_stage(name, rows=None):
+    return _null
+
+
+def log_to_file(path):
+    # Append the JSON stage lines to path (one handler per path, however often called)
+    path = os.path.abspath(path)
+    if not any(getattr(h, 'baseFilename', None) == path for h in log.handlers):
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
+
+def rss_bytes():
+    # Resident set size from /proc (Linux); None where it is not available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Profiler:
+    # Records one dict per stage in start order: stage, depth (nesting level),
+    # seconds, rows, rss_mb and rss_delta_mb, and with trace_memory the tracemalloc
+    # peak above the stage's starting allocation (tracing slows Python code several
+    # times over, so it is off by default; traced runs in other threads wait for
+    # each other). Each finished stage is also logged as a JSON line on the
+    # 'hasty.profile' logger.
+    def __init__(self, enabled=True, trace_memory=False, **context):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.context = context
+        self.records = []
+        self._peaks = []
+        self._started_tracing = False
+
+    def stage(self, name, rows=None):
+        if not self.enabled:
+            return _null
+        return self._stage(name, rows)
+
+    @contextlib.contextmanager
+    def _stage(self, name, rows):
+        record = {'stage': name, 'depth': len(self._peaks), 'seconds': None, 'rows': rows}
+        self.records.append(record)
+        tracing = self.trace_memory
+        if tracing:
+            if not self._peaks:
+                _trace_lock.acquire()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            # tracemalloc has a single peak: fold it into the enclosing stage's
+            # running peak before resetting it for this one
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        self._peaks.append(0)
+        rss = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            after = rss_bytes()
+            record['rss_mb'] = after / MB if after is not None else None
+            record['rss_delta_mb'] = (after - rss) / MB if None not in (after, rss) else None
+            peak = self._peaks.pop()
+            if tracing:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                record['peak_mb'] = (peak - base) / MB
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                else:
+                    if self._started_tracing:
+                        tracemalloc.stop()
+                        self._started_tracing = False
+                    _trace_lock.release()
+            if log.isEnabledFor(logging.INFO):
+                log.info(json.dumps({'time': round(time.time(), 3), **self.context, **record}, default=str))
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=['stage', 'depth', 'seconds', 'rows', 'rss_mb',
+                                                   'rss_delta_mb'] + (['peak_mb'] if self.trace_memory else []))
+
+    def to_dict(self):
+        return {**self.context, 'trace_memory': self.trace_memory, 'stages': self.records}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), default=str, **kwargs)
@@ -0,0 +1,99 @@
+# Background jobs: run long analyses on a shared worker pool so a Streamlit
+# session (or several) can keep rerunning and polling while the work goes on.
+#
+#   runner = JobRunner(max_workers=2)
+#   job = runner.submit(key, fn, *args)   # fn(job, *args); same key -> same job
+#   job.status, job.fraction, job.message, job.result, job.error
+#
+# Threads rather than processes: jobs hand their results back into the in-process
+# ResultCache, and the heavy lifting is vectorised pandas/numpy and zlib work.
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.status = 'queued'
+        self.done = 0
+        self.total = 0
+        self.message = 'Waiting for a free worker'
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def progress(self, done, total, message=None):
+        # Matches the progress(done, total, message) callbacks of run_analysis and export_bytes
+        self.done, self.total = done, total
+        self.message = message or f"Commodity sheets: {done} of {total}"
+
+    def update(self, message):
+        self.message = message
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def running(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobRunner:
+    # Keeps the most recent max_jobs jobs by key; submitting a key whose job is
+    # queued, running or done returns that job instead of starting another
+    def __init__(self, max_workers=2, max_jobs=32):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hasty-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != 'failed':
+                self._jobs.move_to_end(key)
+                return job
+            job = self._jobs[key] = Job(key)
+            while len(self._jobs) > self.max_jobs:
+                oldest = next((k for k, j in self._jobs.items() if not j.running), None)
+                if oldest is None:
+                    break
+                del self._jobs[oldest]
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def discard(self, key):
+        # Forget a finished job (e.g. once its result is cached elsewhere)
+        with self._lock:
+            if key in self._jobs and not self._jobs[key].running:
+                del self._jobs[key]
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        job.status, job.started = 'running', time.time()
+        job.message = 'Starting'
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status, job.message = 'done', 'Finished'
+        except Exception as e:
+            job.error = e
+            job.status, job.message = 'failed', f"{type(e).__name__}: {e}"
+        job.finished = time.time()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
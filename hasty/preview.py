@@ -0,0 +1,37 @@
+# Paged previews and per-commodity summaries of a parsed survey, for display.
+import math
+
+import pandas as pd
+
+
+unit_cols = ['tp_unit', 'parea_unit', 'qsales_unit']
+
+
+def page_count(df, page_size):
+    return max(1, math.ceil(len(df) / page_size))
+
+
+def preview_page(df, page, page_size=20, columns=None):
+    # Only the requested window (and columns) is sliced out and handed to the
+    # display, so its cost does not grow with the sheet; page is 1-based
+    start = (page - 1) * page_size
+    window = df.iloc[start:start + page_size]
+    return window[list(columns)] if columns else window
+
+
+def commodity_summary(df_participants):
+    # One row per commodity in sheet order: type, row count, participants by sex
+    # and the units used for production, area and sales
+    df = df_participants
+    names = df['commodity_name']
+    g = df.groupby(names, sort=False)
+    summary = pd.DataFrame({'commodity_type': g['commodity_type'].first().astype(str), 'rows': g.size()})
+    for c in ['totalmf', 'male', 'female']:
+        summary[c] = pd.to_numeric(df[c], errors='coerce').groupby(names, sort=False).sum()
+    for c in unit_cols:
+        if c in df.columns:
+            pairs = df[['commodity_name', c]].dropna().drop_duplicates()
+            units = pairs.groupby('commodity_name', sort=False)[c].agg(lambda s: ', '.join(sorted(s.astype(str))))
+            summary[c] = units.reindex(summary.index).fillna('')
+    summary.index.name = 'commodity_name'
+    return summary.rename(columns={'totalmf': 'participants'})
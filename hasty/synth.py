@@ -0,0 +1,109 @@
+# Synthetic HASTY survey workbooks for benchmarking and scale testing.
+#
+#   python -m hasty.synth survey_100k.xlsx --rows 100000 --commodities 40 --area-units dec:0.5,acre:0.3,ha:0.2
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .export import write_excel
+
+template_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'survey_update.xlsx')
+
+
+def parse_mix(spec):
+    # "kg:0.8,mt:0.2" -> {'kg': 0.8, 'mt': 0.2}
+    mix = {}
+    for part in spec.split(','):
+        unit, _, weight = part.partition(':')
+        mix[unit.strip()] = float(weight or 1)
+    return mix
+
+
+def pick(rng, mix, n):
+    units = list(mix)
+    weights = np.array([mix[u] for u in units], dtype=float)
+    return np.array(units, dtype=object)[rng.choice(len(units), n, p=weights / weights.sum())]
+
+
+def make_technology(extra_items=0, seed=0):
+    # The template technology sheet, optionally padded with extra agriculture items
+    df_tech = pd.read_excel(template_path, sheet_name='technology')
+    if extra_items:
+        rng = np.random.default_rng(seed)
+        extra = pd.DataFrame({'sl': np.arange(len(df_tech) + 1, len(df_tech) + extra_items + 1),
+                              'items': [f"Synthetic practice {i}" for i in range(extra_items)],
+                              'value': rng.uniform(0, 100, extra_items).round(1),
+                              'category': 'agriculture', 'unit': 'percentage'})
+        df_tech = pd.concat([df_tech, extra], ignore_index=True)
+    return df_tech
+
+
+def make_participants(rows, commodities=10, livestock_share=0.3, prod_units='kg:0.8,mt:0.2',
+                      area_units='dec:0.6,acre:0.3,ha:0.1', sales_units='kg:0.8,mt:0.2', rate=80, seed=0):
+    rng = np.random.default_rng(seed)
+    n_livestock = int(round(commodities * livestock_share))
+    names = np.array([f"Commodity {i:03d}" for i in range(commodities)], dtype=object)
+    types = np.array(['livestock'] * n_livestock + ['agriculture'] * (commodities - n_livestock), dtype=object)
+
+    comm = rng.integers(0, commodities, rows)
+    livestock = types[comm] == 'livestock'
+    male = rng.integers(0, 5000, rows)
+    female = rng.integers(0, 5000, rows)
+    total_production = rng.uniform(10, 3000, rows).round(2)
+    return pd.DataFrame({
+        'slno': np.arange(1, rows + 1),
+        'commodity_name': names[comm],
+        'commodity_type': types[comm],
+        'male': male,
+        'female': female,
+        'totalmf': male + female,
+        'Age_15-29_ratio': rng.uniform(0, 30, rows).round(2),
+        'production_area': np.where(livestock, rng.integers(1, 50, rows), rng.uniform(1, 200, rows).round(2)),
+        'parea_unit': np.where(livestock, 'num', pick(rng, parse_mix(area_units), rows)),
+        'total_production': total_production,
+        'tp_unit': pick(rng, parse_mix(prod_units), rows),
+        'quantity_sales': (total_production * rng.uniform(0.5, 1, rows)).round(2),
+        'qsales_unit': pick(rng, parse_mix(sales_units), rows),
+        'value_sales': rng.uniform(1000, 60000, rows).round(2),
+        'vsale_unit': 'bdt',
+        'per_dollar_rate': rate,
+    })
+
+
+def make_survey(rows, commodities=10, tech_items=0, seed=0, **mix):
+    # (participants, technology) frames shaped like survey_update.xlsx
+    return make_participants(rows, commodities, seed=seed, **mix), make_technology(tech_items, seed)
+
+
+def write_survey(path, rows, commodities=10, tech_items=0, seed=0, **mix):
+    df_participants, df_technology = make_survey(rows, commodities, tech_items, seed, **mix)
+    write_excel({'participants': df_participants, 'technology': df_technology}, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m hasty.synth', description='Write a synthetic HASTY survey workbook.')
+    parser.add_argument('output', help='.xlsx file to write')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--commodities', type=int, default=10)
+    parser.add_argument('--livestock-share', type=float, default=0.3, help='fraction of livestock commodities')
+    parser.add_argument('--prod-units', default='kg:0.8,mt:0.2', help='tp_unit mix (default: %(default)s)')
+    parser.add_argument('--area-units', default='dec:0.6,acre:0.3,ha:0.1',
+                        help='parea_unit mix for agriculture; livestock always uses num (default: %(default)s)')
+    parser.add_argument('--sales-units', default='kg:0.8,mt:0.2', help='qsales_unit mix (default: %(default)s)')
+    parser.add_argument('--tech-items', type=int, default=0, help='extra technology items to append')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_survey(args.output, args.rows, args.commodities, args.tech_items, args.seed,
+                 livestock_share=args.livestock_share, prod_units=args.prod_units,
+                 area_units=args.area_units, sales_units=args.sales_units)
+    print(f"wrote {args.rows} participants rows, {args.commodities} commodities to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
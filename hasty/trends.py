@@ -0,0 +1,174 @@
+# Multi-period trends from stored snapshots of computed indicator tables.
+#
+# Every run can save its output sheets as one long Parquet table under
+#   <store>/period=<period>/partner=<partner>/snapshot.parquet
+# and trend/variance sheets are then built from any set of periods by reading
+# only the needed columns of the matching partitions, never the raw uploads.
+#
+#   python -m hasty.trends -s hasty_snapshots --list
+#   python -m hasty.trends -s hasty_snapshots -p 2023 2024 2025 -o trends.xlsx
+#
+# Snapshots need pyarrow.
+import argparse
+import os
+import sys
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+from .export import write_excel
+
+
+snapshot_cols = ['sheet', 'commodity', 'commodity_type', 'section', 'disaggregate', 'unit', 'value']
+key_cols = ['partner', 'sheet', 'commodity', 'section', 'disaggregate', 'unit']
+trend_labels = {'partner': 'Partner', 'sheet': 'Sheet', 'commodity': 'Commodity', 'section': 'Sections',
+                'disaggregate': 'Disaggregate', 'unit': 'Unit'}
+
+
+def snapshot_frame(all_sheets) -> pd.DataFrame:
+    # One long table of every result row: commodity sheets keep their section and
+    # unit, Technology and Hectare rows leave them blank
+    parts = []
+    for sheet, df in all_sheets.items():
+        if 'Commodity_Name' in df.columns:
+            part = pd.DataFrame({'commodity': df['Commodity_Name'], 'commodity_type': df['Commodity_type'],
+                                 'section': df['Sections'], 'disaggregate': df['Disaggregate'],
+                                 'unit': df['Unit']})
+        else:
+            part = pd.DataFrame({'commodity': '', 'commodity_type': '', 'section': '',
+                                 'disaggregate': df['Disaggregate/Technology'], 'unit': ''}, index=df.index)
+        part.insert(0, 'sheet', sheet)
+        part['value'] = pd.to_numeric(df['Result'], errors='coerce').to_numpy(dtype=float)
+        parts.append(part)
+    snap = pd.concat(parts, ignore_index=True)
+    # Few distinct strings per column: dictionary-encoded in Parquet
+    for c in snapshot_cols[:-1]:
+        snap[c] = snap[c].astype(str).astype('category')
+    return snap
+
+
+def snapshot_path(store, period, partner):
+    quote = lambda v: urllib.parse.quote(str(v).strip(), safe='')
+    return os.path.join(store, f"period={quote(period)}", f"partner={quote(partner)}", 'snapshot.parquet')
+
+
+def save_snapshot(all_sheets, store, period, partner='all'):
+    # Replaces any earlier snapshot of the same period and partner
+    if not str(period).strip() or not str(partner).strip():
+        raise ValueError("snapshot period and partner must not be empty")
+    path = snapshot_path(store, period, partner)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(path), '.snapshot.parquet.tmp')  # dot files are not read back
+    snapshot_frame(all_sheets).to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def list_snapshots(store) -> pd.DataFrame:
+    # period, partner, path and size of every stored snapshot (from the directory names only)
+    records = []
+    if os.path.isdir(store):
+        for period_dir in sorted(os.listdir(store)):
+            if not period_dir.startswith('period='):
+                continue
+            for partner_dir in sorted(os.listdir(os.path.join(store, period_dir))):
+                path = os.path.join(store, period_dir, partner_dir, 'snapshot.parquet')
+                if partner_dir.startswith('partner=') and os.path.exists(path):
+                    records.append({'period': urllib.parse.unquote(period_dir[len('period='):]),
+                                    'partner': urllib.parse.unquote(partner_dir[len('partner='):]),
+                                    'path': path, 'kb': round(os.path.getsize(path) / 1024, 1)})
+    return pd.DataFrame(records, columns=['period', 'partner', 'path', 'kb'])
+
+
+def load_snapshots(store, periods=None, partners=None, sheets=None, columns=None) -> pd.DataFrame:
+    # Only the requested columns of the matching period/partner partitions are read
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([('period', pa.string()), ('partner', pa.string())]), flavor='hive')
+    filters = []
+    if periods:
+        filters.append(('period', 'in', [str(p) for p in periods]))
+    if partners:
+        filters.append(('partner', 'in', [str(p) for p in partners]))
+    if sheets:
+        filters.append(('sheet', 'in', list(sheets)))
+    columns = ['period', 'partner'] + [c for c in (columns or snapshot_cols) if c not in ('period', 'partner')]
+    return pd.read_parquet(store, columns=columns, filters=filters or None, partitioning=partitioning)
+
+
+def trend_sheets(snapshots, periods=None) -> dict:
+    # Trend: one row per indicator, one column per period (in order).
+    # Variance: change between each pair of consecutive periods, absolute and in %.
+    # Duplicates: rows sharing an indicator key within one snapshot (e.g. a
+    # technology item listed twice), only when there are any; they are kept as
+    # "<item> (2)", ... in order rather than dropped.
+    snap = snapshots.copy()
+    for c in key_cols + ['period']:
+        snap[c] = snap[c].astype(str)
+    periods = [str(p) for p in periods] if periods else sorted(snap['period'].unique())
+    repeat = snap.groupby(['period'] + key_cols, sort=False).cumcount().to_numpy()
+    duplicated = snap.duplicated(['period'] + key_cols, keep=False).to_numpy()
+    if duplicated.any():
+        duplicates = snap.loc[duplicated, ['period'] + key_cols + ['value']].rename(columns=trend_labels)
+        duplicates = duplicates.rename(columns={'period': 'Period', 'value': 'Value'}).reset_index(drop=True)
+        snap['disaggregate'] = snap['disaggregate'].where(repeat == 0, snap['disaggregate'] + ' (' +
+                                                          pd.Series(repeat + 1, index=snap.index).astype(str) + ')')
+    wide = snap.pivot_table(index=key_cols, columns='period', values='value', aggfunc='first', sort=False)
+    wide = wide.reindex(columns=[p for p in periods if p in wide.columns])
+
+    trend = wide.reset_index().rename(columns=trend_labels)
+    trend.columns = [str(c) for c in trend.columns]
+
+    variance = []
+    for before, after in zip(wide.columns[:-1], wide.columns[1:]):
+        old, new = wide[before].to_numpy(), wide[after].to_numpy()
+        change = new - old
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(old != 0, change / np.abs(old) * 100, np.nan)
+        part = wide.index.to_frame(index=False)
+        part['From'], part['To'] = before, after
+        part['From value'], part['To value'] = old, new
+        part['Change'], part['Change %'] = np.round(change, 2), np.round(pct, 2)
+        variance.append(part)
+    columns = list(trend_labels.values()) + ['From', 'To', 'From value', 'To value', 'Change', 'Change %']
+    variance = (pd.concat(variance, ignore_index=True).rename(columns=trend_labels) if variance
+                else pd.DataFrame(columns=columns))
+    sheets = {'Trend': trend, 'Variance': variance}
+    if duplicated.any():
+        sheets['Duplicates'] = duplicates
+    return sheets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m hasty.trends',
+                                     description='Trend and variance sheets across stored HASTY snapshots.')
+    parser.add_argument('-s', '--store', default='hasty_snapshots', help='snapshot directory (default: %(default)s)')
+    parser.add_argument('-p', '--periods', nargs='+', help='periods to compare (default: all, in order)')
+    parser.add_argument('--partners', nargs='+', help='partners to include (default: all)')
+    parser.add_argument('--sheets', nargs='+', help='output sheets to include, e.g. Technology Hectare')
+    parser.add_argument('-o', '--output', default='hasty_trends.xlsx', help='trend workbook (default: %(default)s)')
+    parser.add_argument('--list', action='store_true', help='list stored snapshots and exit')
+    args = parser.parse_args(argv)
+
+    available = list_snapshots(args.store)
+    if args.list or available.empty:
+        print(available.to_string(index=False) if not available.empty else f"no snapshots in {args.store}")
+        return 0 if args.list else 1
+    snapshots = load_snapshots(args.store, args.periods, args.partners, args.sheets, key_cols + ['value'])
+    if snapshots.empty:
+        print("no snapshot rows match the selection", file=sys.stderr)
+        return 1
+    sheets = trend_sheets(snapshots, args.periods)
+    if 'Duplicates' in sheets:
+        print(f"{len(sheets['Duplicates'])} snapshot rows share an indicator key with another row; "
+              "numbered in the Trend sheet and listed in the Duplicates sheet", file=sys.stderr)
+    write_excel(sheets, args.output)
+    print(f"{len(sheets['Trend'])} indicators over {len(sheets['Trend'].columns) - len(key_cols)} period(s) "
+          f"written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# Unit conversion registry: (quantity, commodity_type, unit) -> factor / divisor.
+#
+# A value in target units (tonnes, hectares) is value / divisor * factor. Entries
+# come from a table with columns quantity, commodity_type, unit, factor, divisor,
+# read from CSV/JSON/xlsx config or a "units" sheet in the survey workbook:
+#
+#   quantity,commodity_type,unit,factor,divisor
+#   production,agriculture,maund,0.0373242,
+#   area,*,bigha,0.1338,
+#
+# "*" matches any commodity type or unit. Entries from a table added with
+# extend() win over the ones they extend (so a user's "production,*,litre" beats
+# the built-in livestock pass-through); within one table the most specific entry
+# wins: exact (type, unit), then (type, *), then (*, unit). Anything else is
+# unknown, passes through unconverted and is reported by compile().
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# quantity -> participants column holding its unit
+unit_columns = {'production': 'tp_unit', 'area': 'parea_unit', 'sales': 'qsales_unit'}
+
+registry_cols = ['quantity', 'commodity_type', 'unit', 'factor', 'divisor']
+
+# The engine's long-standing conversions: kg -> tonne, dec/acre -> ha, and
+# livestock production and sales kept in their own unit
+default_entries = [
+    ('production', '*', 'kg', 1.0, 1000.0),
+    ('production', '*', 'mt', 1.0, 1.0),
+    ('production', '*', 'ton', 1.0, 1.0),
+    ('production', '*', 'tonne', 1.0, 1.0),
+    ('production', 'livestock', '*', 1.0, 1.0),
+    ('sales', '*', 'kg', 1.0, 1000.0),
+    ('sales', '*', 'mt', 1.0, 1.0),
+    ('sales', '*', 'ton', 1.0, 1.0),
+    ('sales', '*', 'tonne', 1.0, 1.0),
+    ('sales', 'livestock', '*', 1.0, 1.0),
+    ('area', '*', 'dec', 1.0, 247.10514233241506),
+    ('area', '*', 'acre', 0.4046, 1.0),
+    ('area', '*', 'ha', 1.0, 1.0),
+    ('area', '*', 'hectare', 1.0, 1.0),
+    ('area', 'livestock', 'num', 1.0, 1.0),
+]
+
+
+def normalize(values) -> pd.Index:
+    return pd.Index(values).astype(str).str.strip().str.lower()
+
+
+def normalized_codes(series):
+    # (row codes, names): one code per distinct stripped, lower-cased value, with
+    # missing values mapped to a trailing '' name
+    codes, uniques = pd.factorize(series)
+    key_codes, names = pd.factorize(normalize(uniques))
+    missing = len(names)
+    codes = np.where(codes >= 0, key_codes[codes] if len(key_codes) else codes, missing)
+    return codes, list(names) + ['']
+
+
+class UnitRegistry:
+    # layers gives each table row the extend() step it came from (0 = base table)
+    def __init__(self, table=None, layers=None):
+        table = pd.DataFrame(default_entries, columns=registry_cols) if table is None else table
+        self.table = table.reset_index(drop=True)
+        self._layers = np.zeros(len(self.table), dtype=int) if layers is None else np.asarray(layers, dtype=int)
+        self._lookup = {(q, t, u): (f, d, layer) for (q, t, u, f, d), layer
+                        in zip(self.table[registry_cols].itertuples(index=False), self._layers.tolist())}
+
+    @classmethod
+    def from_frame(cls, df):
+        # A user table: column names are case-insensitive, commodity_type defaults
+        # to "*" and factor/divisor to 1, blank rows are skipped
+        df = df.rename(columns=lambda c: str(c).strip().lower()).dropna(how='all')
+        missing = [c for c in ('quantity', 'unit') if c not in df.columns]
+        if missing or not {'factor', 'divisor'} & set(df.columns):
+            raise ValueError("unit table needs columns quantity, unit and factor and/or divisor "
+                             f"(got: {', '.join(map(str, df.columns))})")
+        table = pd.DataFrame({
+            'quantity': normalize(df['quantity']),
+            'commodity_type': normalize(df['commodity_type'].fillna('*')) if 'commodity_type' in df else '*',
+            'unit': normalize(df['unit']),
+        })
+        for c in ('factor', 'divisor'):
+            values = pd.to_numeric(df[c], errors='coerce') if c in df else pd.Series(np.nan, index=df.index)
+            table[c] = values.fillna(1.0).to_numpy(dtype=float)
+        bad = ~table['quantity'].isin(list(unit_columns)) | (table['factor'] <= 0) | (table['divisor'] <= 0)
+        if bad.any():
+            # Sheet rows (header = row 1) from the original index, so skipped blank lines still count
+            rows = ', '.join(str(i + 2) for i in df.index[np.flatnonzero(bad.to_numpy())][:10])
+            raise ValueError(f"unit table has invalid entries in row(s) {rows}: quantity must be one of "
+                             f"{', '.join(unit_columns)} and factor/divisor must be positive numbers")
+        return cls(table)
+
+    @classmethod
+    def from_file(cls, path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.csv':
+            return cls.from_frame(pd.read_csv(path))
+        if ext == '.json':
+            with open(path) as f:
+                data = json.load(f)
+            return cls.from_frame(pd.DataFrame(data['units'] if isinstance(data, dict) else data))
+        if ext in ('.xlsx', '.xlsm'):
+            return cls.from_frame(pd.read_excel(path, sheet_name='units'))
+        raise ValueError(f"unsupported unit table format: {path} (use .csv, .json or .xlsx)")
+
+    def extend(self, other):
+        # A new registry where other's entries override this one's
+        if other is None:
+            return self
+        table = pd.concat([self.table, other.table], ignore_index=True)
+        layers = np.concatenate([self._layers, other._layers + self._layers.max(initial=-1) + 1])
+        keep = ~table.duplicated(['quantity', 'commodity_type', 'unit'], keep='last').to_numpy()
+        return UnitRegistry(table[keep], layers[keep])
+
+    def lookup(self, quantity, commodity_type, unit):
+        # (factor, divisor), or None for an unknown unit: the latest layer wins,
+        # then the most specific key
+        best = None
+        for key in ((quantity, commodity_type, unit), (quantity, commodity_type, '*'), (quantity, '*', unit)):
+            found = self._lookup.get(key)
+            if found is not None and (best is None or found[2] > best[2]):
+                best = found
+        return best[:2] if best else None
+
+    def compile(self, df):
+        # quantity -> (factor, divisor, unknown) row arrays. Only distinct
+        # (commodity_type, unit) pairs are looked up; rows gather from the table.
+        n = len(df)
+        if 'commodity_type' in df.columns:
+            type_codes, types = normalized_codes(df['commodity_type'])
+        else:
+            type_codes, types = np.zeros(n, dtype=np.intp), ['']
+        compiled = {}
+        for quantity, col in unit_columns.items():
+            if col not in df.columns:
+                compiled[quantity] = (np.ones(n), np.ones(n), np.zeros(n, dtype=bool))
+                continue
+            unit_codes, units = normalized_codes(df[col])
+            found = [[self.lookup(quantity, t, u) for u in units] for t in types]
+            factor = np.array([[f[0] if f else 1.0 for f in row] for row in found])
+            divisor = np.array([[f[1] if f else 1.0 for f in row] for row in found])
+            unknown = np.array([[f is None for f in row] for row in found])
+            compiled[quantity] = (factor[type_codes, unit_codes], divisor[type_codes, unit_codes],
+                                  unknown[type_codes, unit_codes])
+        return compiled
+
+
+default_units = UnitRegistry()
+
+
+def load_units(path=None, sheet=None):
+    # Defaults, then a config file, then a workbook's own "units" sheet
+    registry = UnitRegistry()
+    if path:
+        registry = registry.extend(UnitRegistry.from_file(path))
+    if sheet is not None and len(sheet):
+        registry = registry.extend(UnitRegistry.from_frame(sheet))
+    return registry
@@ -0,0 +1,109 @@
+# Columnar validation of the participants sheet.
+#
+#   clean, report = validate_participants(df_participants)
+#   run_analysis(clean, df_technology, validated=True)
+#
+# Every rule is a vectorised check over whole columns. report maps "rule:column"
+# to the positional row indices that broke it (only rules with hits appear), and
+# clean is the typed frame the engine consumes without coercing again.
+import numpy as np
+import pandas as pd
+
+from .engine import numeric_cols
+from .ingest import count_cols
+from .units import default_units, unit_columns
+
+
+# Types the engine's sheets know; a unit table can add more (e.g. fisheries)
+commodity_types = {'agriculture', 'livestock'}
+
+rule_descriptions = {
+    'missing_number': 'blank or non-numeric value, counted as 0',
+    'unknown_commodity_type': 'commodity_type is not agriculture, livestock or a type in the unit table',
+    'unknown_unit': 'no conversion for this commodity type and unit; the value is used unconverted',
+    'bad_exchange_rate': 'per_dollar_rate is missing, zero or negative; sales value left out',
+    'negative_count': 'negative participant count',
+    'sex_total_mismatch': 'male + female does not equal totalmf',
+    'age_ratio_range': 'Age_15-29_ratio outside 0-100',
+}
+
+
+def normalized_categories(series):
+    # Stripped, lower-cased categorical built from the distinct values only
+    codes, uniques = pd.factorize(series)
+    keys = pd.Index(uniques).astype(str).str.strip().str.lower()
+    key_codes, categories = pd.factorize(keys)
+    codes = np.where(codes >= 0, key_codes[codes] if len(key_codes) else codes, -1)
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def validate_participants(df_part: pd.DataFrame, units=None):
+    # units is the hasty.units.UnitRegistry the run will convert with
+    units = units or default_units
+    n = len(df_part)
+    clean = df_part.copy()
+    checks = {}
+
+    # Numbers: anything that did not parse is reported and becomes 0 (a missing
+    # rate is reported as a bad exchange rate below)
+    for c in numeric_cols:
+        if c not in clean.columns:
+            continue
+        values = pd.to_numeric(clean[c], errors='coerce')
+        if c != 'per_dollar_rate':
+            checks[f'missing_number:{c}'] = values.isna().to_numpy()
+        values = values.fillna(0)
+        clean[c] = pd.to_numeric(values, downcast='integer') if c in count_cols else values.astype(float)
+
+    # Categories are normalised once per distinct value
+    for c in ['commodity_type'] + list(unit_columns.values()):
+        if c in clean.columns:
+            clean[c] = normalized_categories(clean[c])
+    if 'commodity_type' in clean.columns:
+        known = commodity_types | set(units.table['commodity_type']) - {'*'}
+        checks['unknown_commodity_type:commodity_type'] = ~clean['commodity_type'].isin(known).to_numpy()
+    for quantity, (_, _, unknown) in units.compile(clean).items():
+        if unit_columns[quantity] in clean.columns:
+            checks[f'unknown_unit:{unit_columns[quantity]}'] = unknown
+
+    # A missing or non-positive rate would make the sales value inf or negative:
+    # those rows contribute no sales value
+    if 'per_dollar_rate' in clean.columns:
+        bad_rate = (clean['per_dollar_rate'] <= 0).to_numpy()
+        checks['bad_exchange_rate:per_dollar_rate'] = bad_rate
+        if 'value_sales' in clean.columns and bad_rate.any():
+            clean.loc[bad_rate, 'value_sales'] = 0.0
+            clean.loc[bad_rate, 'per_dollar_rate'] = 1.0
+
+    counts = {c: clean[c].to_numpy(dtype=float) for c in count_cols if c in clean.columns}
+    for c, values in counts.items():
+        checks[f'negative_count:{c}'] = values < 0
+    if len(counts) == 3:
+        checks['sex_total_mismatch:totalmf'] = counts['male'] + counts['female'] != counts['totalmf']
+    if 'Age_15-29_ratio' in clean.columns:
+        age = clean['Age_15-29_ratio'].to_numpy()
+        checks['age_ratio_range:Age_15-29_ratio'] = (age < 0) | (age > 100)
+
+    report = {}
+    for name, mask in checks.items():
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            report[name] = rows.astype(np.int32 if n < 2 ** 31 else np.int64)
+    return clean, report
+
+
+def flagged_rows(report) -> int:
+    # Distinct rows that broke at least one rule
+    return len(np.unique(np.concatenate(list(report.values())))) if report else 0
+
+
+def report_frame(report, examples=10) -> pd.DataFrame:
+    # One line per broken rule, for display: counts plus the first few row indices
+    records = []
+    for name, rows in report.items():
+        rule, column = name.split(':', 1)
+        records.append({'Rule': rule, 'Column': column, 'Rows': len(rows),
+                        'Description': rule_descriptions.get(rule, ''),
+                        'First rows': ', '.join(map(str, rows[:examples].tolist()))
+                        + (', ...' if len(rows) > examples else '')})
+    return pd.DataFrame(records, columns=['Rule', 'Column', 'Rows', 'Description', 'First rows'])
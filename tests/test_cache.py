@@ -0,0 +1,56 @@
+# ResultCache memory and disk tiers, including concurrent writers.
+import os
+import threading
+
+import pandas as pd
+
+from hasty.cache import CALC_VERSION, ResultCache, cache_key
+
+
+def entry(n):
+    return {'participants': pd.DataFrame({'x': range(n)}), 'outputs': {'xlsx': b'x' * n}}
+
+
+def test_disk_tier_round_trip_and_memory_only_puts(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put('a', entry(10), disk=False)
+    assert cache.get('a') is not None
+    assert ResultCache(disk_dir=str(tmp_path)).get('a') is None
+    cache.put('a', entry(10))
+    loaded = ResultCache(disk_dir=str(tmp_path)).get('a')
+    pd.testing.assert_frame_equal(loaded['participants'], entry(10)['participants'])
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    for key in 'abc':
+        cache.put(key, entry(10))
+    assert cache.get('a') is None and cache.get('c') is not None
+
+
+def test_concurrent_puts_share_the_disk_tier(tmp_path):
+    # Same and different keys from several threads, pruning all the while
+    cache = ResultCache(disk_dir=str(tmp_path), disk_max_bytes=20_000)
+    errors = []
+
+    def writer(i):
+        try:
+            for j in range(30):
+                cache.put(f"k{(i + j) % 6}", entry(2_000))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert not [n for n in os.listdir(tmp_path) if n.endswith('.tmp')]
+    assert sum(os.path.getsize(tmp_path / n) for n in os.listdir(tmp_path)) <= 20_000 + 10_000
+
+
+def test_cache_key_depends_on_content_and_version():
+    assert cache_key(b'a') == cache_key(b'a') != cache_key(b'b')
+    assert cache_key(b'upload', b'units') == cache_key(b'uploadunits')
+    assert cache_key(b'a').startswith(f"{CALC_VERSION}-")
@@ -0,0 +1,46 @@
+# Consolidation: merged workbook partials against one run over all participants.
+import numpy as np
+import pandas as pd
+import pytest
+
+from hasty.consolidate import Portfolio, workbook_ids
+from hasty.engine import run_analysis
+from hasty.export import export_bytes
+from hasty.synth import make_survey
+
+
+def workbook(df_participants, df_technology):
+    return export_bytes({'participants': df_participants, 'technology': df_technology})
+
+
+def test_merged_partials_match_run_on_concatenated_participants():
+    df_part, df_tech = make_survey(900, commodities=5, seed=3)
+    portfolio = Portfolio()
+    # Three partners sharing one file name and technology sheet, split by row
+    for i, part in enumerate(np.array_split(np.arange(len(df_part)), 3)):
+        assert portfolio.update(f"p{i}/survey_update.xlsx", workbook(df_part.iloc[part], df_tech))
+    merged = portfolio.sheets()
+    expected = run_analysis(df_part, df_tech)
+
+    commodities = [s for s in expected if s not in ('Technology', 'Hectare')]
+    assert list(merged) == commodities + ['Technology', 'Hectare']
+    for name in commodities + ['Hectare']:
+        pd.testing.assert_frame_equal(merged[name].drop(columns='Result'), expected[name].drop(columns='Result'),
+                                      check_dtype=False)
+        np.testing.assert_allclose(merged[name]['Result'], expected[name]['Result'], rtol=0, atol=0.01 + 1e-9)
+
+
+def test_update_skips_unchanged_and_drops_failed_workbooks():
+    df_part, df_tech = make_survey(100, commodities=2)
+    data = workbook(df_part, df_tech)
+    portfolio = Portfolio()
+    assert portfolio.update('a.xlsx', data)
+    assert not portfolio.update('a.xlsx', data)
+    with pytest.raises(Exception):
+        portfolio.update('a.xlsx', b'not a workbook')
+    assert 'a.xlsx' not in portfolio.workbooks
+
+
+def test_workbook_ids_number_repeated_names():
+    assert workbook_ids(['survey_update.xlsx', 'b.xlsx', 'survey_update.xlsx']) == \
+        ['survey_update.xlsx', 'b.xlsx', 'survey_update (2).xlsx']
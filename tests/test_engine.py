@@ -0,0 +1,175 @@
+# Equivalence of the vectorized engine with the original per-row functions.
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hasty.engine import (TechnologySheetError, indicator_sections, numeric_cols, prepare_participants,
+                          run_analysis)
+from hasty.synth import make_survey
+from hasty.validate import validate_participants
+
+survey_path = os.path.join(os.path.dirname(__file__), os.pardir, 'survey_update.xlsx')
+
+contrib_cols = ['male_prod_contrib', 'female_prod_contrib', 'male_area_contrib', 'female_area_contrib',
+                'male_vol_sales', 'female_vol_sales', 'male_val_sales', 'female_val_sales']
+
+
+# --- Reference: the per-row helpers of the original compute_for_commodity ---
+def prod_contrib(row, sex_count_col):
+    tp_unit = str(row.get('tp_unit', '')).strip().lower()
+    commodity_type = str(row.get('commodity_type', '')).strip().lower()
+    count = row.get(sex_count_col, 0)
+    tp = row.get('total_production', 0)
+    if commodity_type == "livestock":
+        return count * tp
+    else:
+        if tp_unit == 'kg':
+            return (count * tp) / 1000.0
+        else:
+            return count * tp
+
+
+def area_contrib(row, sex_count_col):
+    unit = str(row.get('parea_unit', '')).strip().lower()
+    count = row.get(sex_count_col, 0)
+    pa = row.get('production_area', 0)
+    if unit == 'dec':
+        return (count * pa) / 247.10514233241506
+    elif unit == 'acre':
+        return (count * pa) * 0.4046
+    else:
+        return (count * pa)
+
+
+def volume_sales(row, sex_count_col):
+    q_unit = str(row.get('qsales_unit', '')).strip().lower()
+    comm_type = str(row.get('commodity_type', '')).strip().lower()
+    count = row.get(sex_count_col, 0)
+    qty = row.get('quantity_sales', 0)
+    if comm_type == "livestock":
+        return count * qty
+    else:
+        if q_unit == "kg":
+            return (count * qty) / 1000.0
+        else:
+            return count * qty
+
+
+def value_sales(row, sex_count_col):
+    count = row.get(sex_count_col, 0)
+    val = row.get("value_sales", 0)
+    per_rate = row.get("per_dollar_rate", 1)
+    return round((count * val) / per_rate, 2)
+
+
+def reference_contributions(df_part):
+    df = df_part.copy()
+    for c in numeric_cols:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    out = pd.DataFrame(index=df.index)
+    for sex in ('male', 'female'):
+        out[f'{sex}_prod_contrib'] = df.apply(lambda r: prod_contrib(r, sex), axis=1).astype(float)
+        out[f'{sex}_area_contrib'] = df.apply(lambda r: area_contrib(r, sex), axis=1).astype(float)
+        out[f'{sex}_vol_sales'] = df.apply(lambda r: volume_sales(r, sex), axis=1).astype(float)
+        out[f'{sex}_val_sales'] = df.apply(lambda r: value_sales(r, sex), axis=1).astype(float)
+    return out[contrib_cols]
+
+
+def assert_contributions_match(df_part):
+    # Both the raw path and the validated path (clean frame, registry units) the app uses
+    expected = reference_contributions(df_part)
+    actual = prepare_participants(df_part)[contrib_cols].astype(float)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+    clean, _ = validate_participants(df_part)
+    actual = prepare_participants(clean, validated=True)[contrib_cols].astype(float)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+
+def test_contributions_match_reference_on_survey():
+    assert_contributions_match(pd.read_excel(survey_path, sheet_name='participants'))
+
+
+def test_contributions_match_reference_on_mixed_units():
+    rng = np.random.default_rng(7)
+    n = 60
+    df = pd.DataFrame({
+        'commodity_name': rng.choice(['Maize', 'Goat', 'Rice'], n),
+        'commodity_type': rng.choice(['agriculture', ' Livestock ', 'LIVESTOCK', 'agriculture ', None], n),
+        'tp_unit': rng.choice(['kg', ' KG', 'Kg ', 'mt', 'maund', None], n),
+        'parea_unit': rng.choice(['dec', ' DEC', 'acre', 'Acre ', 'ha', 'bigha', None], n),
+        'qsales_unit': rng.choice(['kg', 'KG ', 'mt', 'litre', None], n),
+        'male': rng.integers(0, 500, n),
+        'female': rng.integers(0, 500, n),
+        'Age_15-29_ratio': rng.uniform(0, 100, n).round(1),
+        'production_area': rng.uniform(0, 50, n).round(2),
+        'total_production': rng.uniform(0, 5000, n).round(2),
+        'quantity_sales': rng.uniform(0, 4000, n).round(2),
+        'value_sales': rng.uniform(0, 90000, n).round(2),
+        'per_dollar_rate': rng.choice([80.0, 110.5, 119.0], n),
+    })
+    df['totalmf'] = df['male'] + df['female']
+    df.loc[[3, 17], 'total_production'] = np.nan
+    df = df.astype({'tp_unit': object, 'parea_unit': object, 'qsales_unit': object})
+    df.loc[[5, 11], ['tp_unit', 'parea_unit', 'qsales_unit']] = np.nan
+    assert_contributions_match(df)
+
+
+@pytest.mark.parametrize('value', [304444.115, 0.125, 2.675, 1.005])
+def test_value_sales_rounds_half_cent_ties_like_round(value):
+    df = pd.DataFrame({'commodity_name': ['X'], 'commodity_type': ['agriculture'], 'tp_unit': ['kg'],
+                       'parea_unit': ['ha'], 'qsales_unit': ['kg'], 'male': [1], 'female': [0], 'totalmf': [1],
+                       'Age_15-29_ratio': [0.0], 'production_area': [0.0], 'total_production': [0.0],
+                       'quantity_sales': [0.0], 'value_sales': [value], 'per_dollar_rate': [1.0]})
+    assert_contributions_match(df)
+
+
+def reference_commodity_table(df_comm):
+    # The original per-commodity totals: Series.sum() over each commodity's own rows
+    df = df_comm.copy()
+    for c in numeric_cols:
+        df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    df = df.join(reference_contributions(df_comm))
+    if df['totalmf'].sum() > 0:
+        age_ratio = (df['Age_15-29_ratio'] * df['totalmf']).sum() / df['totalmf'].sum()
+    else:
+        age_ratio = df['Age_15-29_ratio'].mean() if len(df) > 0 else 0
+    age_frac = float(age_ratio) / 100.0 if pd.notna(age_ratio) else 0.0
+
+    name = df_comm['commodity_name'].iloc[0]
+    ctype = str(df_comm['commodity_type'].iloc[0]).strip().lower()
+    totals = {key: (df[male].sum(), df[female].sum()) for _, key, male, female, _ in indicator_sections}
+    prod, area = sum(totals['prod']), sum(totals['area'])
+    rows = [(name, ctype, 'Overall', 'Yield', round(prod / area if area != 0 else 0, 2), 'Yield')]
+    for section, key, _, _, unit in indicator_sections:
+        male, female = totals[key]
+        total = male + female
+        values = [total, male, female, total, total * age_frac, total * (1 - age_frac)]
+        for d, v in zip(['Sex', 'Male', 'Female', 'Age', '15-29', '30+'], values):
+            rows.append((name, ctype, section, d, round(v, 2), unit))
+    return pd.DataFrame(rows, columns=['Commodity_Name', 'Commodity_type', 'Sections', 'Disaggregate',
+                                       'Result', 'Unit'])
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_commodity_sheets_match_per_subset_reference(seed):
+    # One groupby pass sums in a different order than the original per-subset sums,
+    # so results that land on a rounding tie may move by one cent; nothing more
+    df_part, df_tech = make_survey(1500, commodities=4, seed=seed)
+    df_part['Age_15-29_ratio'] = df_part['Age_15-29_ratio'].round(1)
+    sheets = run_analysis(df_part, df_tech)
+    for name, df_comm in df_part.groupby('commodity_name', sort=False):
+        expected = reference_commodity_table(df_comm)
+        actual = sheets[name]
+        pd.testing.assert_frame_equal(actual.drop(columns='Result'), expected.drop(columns='Result'),
+                                      check_dtype=False)
+        np.testing.assert_allclose(actual['Result'], expected['Result'], rtol=0, atol=0.01 + 1e-9)
+
+
+def test_missing_technology_items_raise_technology_sheet_error():
+    df_part, df_tech = make_survey(50, commodities=2)
+    df_tech = df_tech[df_tech['items'] != 'Ag_unique_M_Total']
+    with pytest.raises(TechnologySheetError, match='Ag_unique_M_Total'):
+        run_analysis(df_part, df_tech)
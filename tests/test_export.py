@@ -0,0 +1,56 @@
+# Output writers: xlsx read back cell by cell, and the zipped bundles.
+import io
+import zipfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from hasty.export import export_bytes, write_excel
+
+
+def sheets():
+    n = 25_003  # more than one row chunk
+    detail = pd.DataFrame({'name': [f"item {i}" for i in range(n)], 'count': np.arange(n),
+                           'value': np.arange(n) / 8})  # exact in 15 digits
+    detail.loc[3, 'value'] = np.nan
+    detail.loc[10_000, 'name'] = None
+    return {
+        'Maize': pd.DataFrame({'Commodity_Name': ['Maize'] * 3, 'Sections': ['A', 'B', 'C'],
+                               'Result': [1.25, np.inf, -np.inf], 'Unit': ['ha', None, 'tonne']}),
+        'A sheet name longer than thirty-one characters': pd.DataFrame({'Result': [1, 2]}),
+        'Detail': detail,
+    }
+
+
+def read_back(data):
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+    try:
+        return {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb.worksheets}
+    finally:
+        wb.close()
+
+
+def test_xlsx_round_trip_matches_frames():
+    frames = sheets()
+    written = read_back(export_bytes(frames))
+    assert list(written) == [name[:31] for name in frames]
+    for name, df in frames.items():
+        rows = written[name[:31]]
+        assert rows[0] == tuple(df.columns)
+        expected = df.astype(object).where(df.notna(), None)
+        expected = expected.replace({np.inf: 'inf', -np.inf: '-inf'})
+        assert rows[1:] == list(expected.itertuples(index=False, name=None))
+
+
+def test_xlsx_to_path(tmp_path):
+    path = tmp_path / 'out.xlsx'
+    write_excel({'Maize': sheets()['Maize']}, str(path))
+    assert read_back(path.read_bytes())['Maize'][2] == ('Maize', 'B', 'inf', None)
+
+
+def test_csv_bundle_holds_every_sheet():
+    frames = sheets()
+    with zipfile.ZipFile(io.BytesIO(export_bytes(frames, 'csv'))) as zf:
+        assert zf.namelist() == [f"{name}.csv" for name in frames]
+        pd.testing.assert_frame_equal(pd.read_csv(zf.open('Maize.csv')), frames['Maize'])
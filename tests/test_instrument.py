@@ -0,0 +1,30 @@
+# Profiler stages from several threads: tracemalloc is process-wide, so traced
+# stage trees must not start, reset or stop it under one another.
+import threading
+import time
+import tracemalloc
+
+from hasty.instrument import MB, Profiler
+
+
+def traced_run(profiler):
+    with profiler.stage('outer'):
+        with profiler.stage('allocate'):
+            block = bytearray(profiler.context['size'])
+            time.sleep(0.05)
+            del block
+        time.sleep(0.05)
+
+
+def test_concurrent_traced_profilers_keep_their_own_peaks():
+    profilers = [Profiler(trace_memory=True, size=(i + 1) * 8 * MB) for i in range(4)]
+    threads = [threading.Thread(target=traced_run, args=(p,)) for p in profilers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not tracemalloc.is_tracing()
+    for profiler in profilers:
+        outer, allocate = profiler.records
+        assert allocate['peak_mb'] >= profiler.context['size'] / MB
+        assert outer['peak_mb'] >= allocate['peak_mb']
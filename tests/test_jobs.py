@@ -0,0 +1,78 @@
+# Background jobs: dedup by key, failure and resubmit, discard and progress.
+import threading
+
+import pytest
+
+from hasty.engine import run_analysis
+from hasty.jobs import Job, JobRunner
+from hasty.synth import make_survey
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(max_workers=2)
+    yield runner
+    runner.shutdown()
+
+
+def wait(job, timeout=10):
+    for _ in range(int(timeout / 0.01)):
+        if not job.running:
+            return job
+        threading.Event().wait(0.01)
+    raise TimeoutError(job.key)
+
+
+def test_same_key_returns_the_same_job(runner):
+    release = threading.Event()
+    calls = []
+
+    def work(job, value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    first = runner.submit('k', work, 1)
+    assert runner.submit('k', work, 2) is first
+    release.set()
+    assert wait(first).status == 'done' and first.result == 2
+    assert runner.submit('k', work, 3) is first  # done jobs are shared too
+    assert calls == [1]
+
+
+def test_failed_job_is_replaced_on_resubmit(runner):
+    def fail(job):
+        raise ValueError("bad sheet")
+
+    failed = wait(runner.submit('k', fail))
+    assert failed.status == 'failed' and isinstance(failed.error, ValueError)
+    assert failed.message == 'ValueError: bad sheet'
+    retried = runner.submit('k', lambda job: 'ok')
+    assert retried is not failed and wait(retried).result == 'ok'
+
+
+def test_discard_forgets_finished_jobs_only(runner):
+    release = threading.Event()
+    running = runner.submit('running', lambda job: release.wait(5))
+    done = wait(runner.submit('done', lambda job: None))
+    runner.discard('running')
+    runner.discard('done')
+    assert runner.get('running') is running and runner.get('done') is None
+    release.set()
+    wait(running)
+
+
+def test_run_analysis_progress_moves_through_every_stage():
+    df_part, df_tech = make_survey(200, commodities=3)
+    job = Job('k')
+    seen = []
+
+    def progress(done, total, message):
+        job.progress(done, total, message)
+        seen.append((job.fraction, job.message))
+
+    run_analysis(df_part, df_tech, progress=progress)
+    fractions = [f for f, _ in seen]
+    assert fractions == sorted(fractions) and fractions[0] == 0 and fractions[-1] == 1
+    assert [m for _, m in seen][:2] == ['Preparing participants', 'Aggregating commodities']
+    assert 'Technology and Hectare sheets' in [m for _, m in seen]
@@ -0,0 +1,78 @@
+# Snapshots: save, list and filtered load, then the Trend and Variance sheets.
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from hasty.trends import key_cols, list_snapshots, load_snapshots, save_snapshot, trend_sheets
+
+
+def result_sheets(production, adopters, items=('Line sowing',)):
+    maize = pd.DataFrame({'Commodity_Name': 'Maize', 'Commodity_type': 'agriculture',
+                          'Sections': ['Total production', 'Total production'], 'Disaggregate': ['Sex', 'Male'],
+                          'Result': [production, production / 2], 'Unit': 'tonne_or_unit'})
+    technology = pd.DataFrame({'Disaggregate/Technology': ['Smallholder Producer', *items],
+                               'Result': [adopters, *range(len(items))]})
+    return {'Maize': maize, 'Technology': technology}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = str(tmp_path / 'snapshots')
+    save_snapshot(result_sheets(100.0, 0), store, 2023, 'Partner A')
+    save_snapshot(result_sheets(150.0, 40), store, 2024, 'Partner A')
+    save_snapshot(result_sheets(120.0, 50), store, 2025, 'Partner A')
+    save_snapshot(result_sheets(10.0, 5), store, 2024, 'partner/b')
+    return store
+
+
+def test_list_and_filtered_load(store):
+    listed = list_snapshots(store)
+    assert listed[['period', 'partner']].values.tolist() == [
+        ['2023', 'Partner A'], ['2024', 'Partner A'], ['2024', 'partner/b'], ['2025', 'Partner A']]
+
+    loaded = load_snapshots(store, periods=[2024, 2025], partners=['Partner A'], sheets=['Maize'],
+                            columns=key_cols + ['value'])
+    assert list(loaded.columns) == ['period', 'partner'] + [c for c in key_cols if c != 'partner'] + ['value']
+    assert sorted(loaded['period'].astype(str).unique()) == ['2024', '2025']
+    assert set(loaded['partner'].astype(str)) == {'Partner A'} and set(loaded['sheet'].astype(str)) == {'Maize'}
+    assert len(loaded) == 4
+
+    assert set(load_snapshots(store, partners=['partner/b'])['period'].astype(str)) == {'2024'}
+
+
+def test_trend_and_variance_values(store):
+    snapshots = load_snapshots(store, partners=['Partner A'], columns=key_cols + ['value'])
+    sheets = trend_sheets(snapshots, ['2023', '2024', '2025'])
+    assert 'Duplicates' not in sheets
+
+    trend = sheets['Trend'].set_index(['Sheet', 'Disaggregate'])
+    assert trend.loc[('Maize', 'Sex'), ['2023', '2024', '2025']].tolist() == [100.0, 150.0, 120.0]
+    assert trend.loc[('Technology', 'Smallholder Producer'), ['2023', '2024', '2025']].tolist() == [0, 40, 50]
+
+    variance = sheets['Variance'].set_index(['Sheet', 'Disaggregate', 'From'])
+    row = variance.loc[('Maize', 'Sex', '2024')]
+    assert (row['To'], row['Change'], row['Change %']) == ('2025', -30.0, -20.0)
+    row = variance.loc[('Maize', 'Sex', '2023')]
+    assert (row['Change'], row['Change %']) == (50.0, 50.0)
+    # No percentage change from zero
+    row = variance.loc[('Technology', 'Smallholder Producer', '2023')]
+    assert row['Change'] == 40 and np.isnan(row['Change %'])
+
+
+def test_single_period_has_empty_variance(store):
+    sheets = trend_sheets(load_snapshots(store, periods=['2023']))
+    assert sheets['Variance'].empty and list(sheets['Trend'].columns)[-1] == '2023'
+
+
+def test_duplicate_indicator_keys_are_kept_and_reported(tmp_path):
+    store = str(tmp_path)
+    save_snapshot(result_sheets(100.0, 10, items=('Line sowing', 'Line sowing')), store, 2024)
+    save_snapshot(result_sheets(110.0, 20, items=('Line sowing', 'Line sowing')), store, 2025)
+    sheets = trend_sheets(load_snapshots(store))
+    trend = sheets['Trend'].set_index('Disaggregate')
+    assert trend.loc['Line sowing', ['2024', '2025']].tolist() == [0.0, 0.0]
+    assert trend.loc['Line sowing (2)', ['2024', '2025']].tolist() == [1.0, 1.0]
+    assert len(sheets['Duplicates']) == 4
+    assert set(sheets['Duplicates']['Disaggregate']) == {'Line sowing'}
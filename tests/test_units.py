@@ -0,0 +1,61 @@
+# Unit registry: lookup precedence, extend() overrides and unknown units.
+import numpy as np
+import pandas as pd
+import pytest
+
+from hasty.units import UnitRegistry, default_units
+
+
+def user_units(rows):
+    return UnitRegistry.from_frame(pd.DataFrame(rows, columns=['quantity', 'commodity_type', 'unit', 'factor',
+                                                               'divisor']))
+
+
+def test_builtin_precedence():
+    assert default_units.lookup('production', 'agriculture', 'kg') == (1.0, 1000.0)
+    # (type, *) beats (*, unit) within one table: livestock kg stays unconverted
+    assert default_units.lookup('production', 'livestock', 'kg') == (1.0, 1.0)
+    assert default_units.lookup('area', 'livestock', 'num') == (1.0, 1.0)
+    assert default_units.lookup('area', 'livestock', 'dec') == (1.0, 247.10514233241506)
+    assert default_units.lookup('production', 'agriculture', 'maund') is None
+
+
+def test_extend_overrides_builtin_entries_and_wildcards():
+    units = default_units.extend(user_units([
+        ('production', '*', 'litre', 0.00103, None),
+        ('production', '*', 'kg', 1.0, 100.0),
+        ('area', 'agriculture', 'bigha', 0.1338, None),
+    ]))
+    # A user (*, unit) entry beats the built-in livestock pass-through
+    assert units.lookup('production', 'livestock', 'litre') == (0.00103, 1.0)
+    assert units.lookup('production', 'agriculture', 'kg') == (1.0, 100.0)
+    assert units.lookup('area', 'agriculture', 'bigha') == (0.1338, 1.0)
+    assert units.lookup('area', 'livestock', 'bigha') is None
+    assert units.lookup('sales', 'agriculture', 'kg') == (1.0, 1000.0)
+    assert default_units.lookup('production', 'livestock', 'litre') == (1.0, 1.0)
+
+
+def test_later_extend_wins():
+    first = default_units.extend(user_units([('area', '*', 'bigha', 0.1338, None)]))
+    second = first.extend(user_units([('area', '*', 'bigha', 0.12, None)]))
+    assert second.lookup('area', 'agriculture', 'bigha') == (0.12, 1.0)
+    assert len(second.table) == len(first.table)
+
+
+def test_compile_reports_unknown_units():
+    df = pd.DataFrame({'commodity_type': ['Agriculture ', 'livestock', 'agriculture', 'agriculture'],
+                       'tp_unit': [' KG', 'litre', 'maund', np.nan],
+                       'parea_unit': ['dec', 'num', 'acre', 'ha']})
+    compiled = default_units.compile(df)
+    factor, divisor, unknown = compiled['production']
+    np.testing.assert_array_equal(divisor, [1000.0, 1.0, 1.0, 1.0])
+    np.testing.assert_array_equal(unknown, [False, False, True, True])
+    assert not compiled['area'][2].any()
+    assert not compiled['sales'][2].any()  # no qsales_unit column: nothing to convert
+
+
+def test_from_frame_reports_sheet_rows_past_blank_lines():
+    df = pd.DataFrame({'quantity': ['production', None, 'volume'], 'unit': ['kg', None, 'kg'],
+                       'factor': [1, None, 1]})
+    with pytest.raises(ValueError, match=r'row\(s\) 4:'):
+        UnitRegistry.from_frame(df)
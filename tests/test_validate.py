@@ -0,0 +1,70 @@
+# Participants validation: each rule's rows, the cleanup and the report helpers.
+import pandas as pd
+
+from hasty.units import UnitRegistry, default_units
+from hasty.validate import flagged_rows, report_frame, rule_descriptions, validate_participants
+
+
+def participants():
+    # Row 0 is clean; rows 1-6 break one rule each and row 7 breaks two
+    return pd.DataFrame({
+        'commodity_name': ['Maize'] * 8,
+        'commodity_type': ['agriculture', 'Livestock ', 'fisheries', 'agriculture', 'agriculture',
+                           'agriculture', 'agriculture', 'agriculture'],
+        'tp_unit': ['kg', 'KG', 'kg', 'maund', 'kg', 'kg', 'kg', 'kg'],
+        'parea_unit': ['dec', 'num', 'dec', 'dec', 'dec', 'dec', 'dec', 'dec'],
+        'qsales_unit': ['kg'] * 8,
+        'male': [1, 1, 1, 1, 1, 1, -2, 1],
+        'female': [1, 1, 1, 1, 1, 1, 4, 1],
+        'totalmf': [2, 2, 2, 2, 2, 3, 2, 2],
+        'Age_15-29_ratio': [50, 50, 50, 50, 50, 50, 50, 150],
+        'production_area': [10, 'n/a', 10, 10, 10, 10, 10, 10],
+        'total_production': [100.0] * 8,
+        'quantity_sales': [50.0] * 8,
+        'value_sales': [500.0] * 8,
+        'per_dollar_rate': [110, 110, 110, 110, 0, 110, 110, None],
+    })
+
+
+def test_each_rule_reports_its_rows():
+    _, report = validate_participants(participants())
+    assert {k: v.tolist() for k, v in report.items()} == {
+        'missing_number:production_area': [1],
+        'unknown_commodity_type:commodity_type': [2],
+        'unknown_unit:tp_unit': [3],
+        'bad_exchange_rate:per_dollar_rate': [4, 7],
+        'negative_count:male': [6],
+        'sex_total_mismatch:totalmf': [5],
+        'age_ratio_range:Age_15-29_ratio': [7],
+    }
+    assert {name.split(':')[0] for name in report} == set(rule_descriptions)
+
+
+def test_clean_frame_is_typed_and_drops_bad_rate_sales():
+    clean, _ = validate_participants(participants())
+    assert clean['production_area'].tolist() == [10.0, 0.0] + [10.0] * 6
+    assert clean['value_sales'].tolist() == [500.0] * 4 + [0.0, 500.0, 500.0, 0.0]
+    assert clean['per_dollar_rate'].tolist() == [110.0] * 4 + [1.0, 110.0, 110.0, 1.0]
+    assert clean['commodity_type'].tolist()[:3] == ['agriculture', 'livestock', 'fisheries']
+    assert clean['tp_unit'].tolist()[1] == 'kg'
+    assert pd.api.types.is_integer_dtype(clean['male'])
+
+
+def test_unit_table_types_and_units_are_known():
+    units = default_units.extend(UnitRegistry.from_frame(pd.DataFrame(
+        {'quantity': ['production'], 'commodity_type': ['fisheries'], 'unit': ['maund'], 'factor': [0.0373]})))
+    _, report = validate_participants(participants(), units)
+    assert 'unknown_commodity_type:commodity_type' not in report
+    assert report['unknown_unit:tp_unit'].tolist() == [3]  # maund is known for fisheries only
+
+
+def test_flagged_rows_and_report_frame():
+    _, report = validate_participants(participants())
+    assert flagged_rows(report) == 7
+    assert flagged_rows({}) == 0
+    frame = report_frame(report, examples=1)
+    assert list(frame.columns) == ['Rule', 'Column', 'Rows', 'Description', 'First rows']
+    row = frame.set_index('Rule').loc['bad_exchange_rate']
+    assert (row['Column'], row['Rows'], row['First rows']) == ('per_dollar_rate', 2, '4, ...')
+    assert row['Description'] == rule_descriptions['bad_exchange_rate']
+    assert report_frame({}).empty